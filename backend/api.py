@@ -1,12 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from datetime import datetime
-from database import SessionLocal, engine
+from database import SessionLocal, WriteSessionLocal, engine, tag
 from models import Customer, Card, Trip, Case, TapHistory, FareDispute
+from ids import next_id, next_ids
+from ledger import apply_delta, append_entries
+from pagination import decode_cursor, keyset, next_cursor, set_next_cursor
+from sampling import card_sampler
+from stats import bump, compute_exact, read_counters, COUNTERS
+from querycount import query_budget
+from cache import cached_card, cached_customer, cached_customer_cards
+from etags import conditional_get
+from fastjson import row_columns, rows_response
+from idempotency import claim_or_replay, remember, scoped_key
+from tap_archive import archived_tap, archived_taps, newest_first, reaches_archive
 from pydantic import BaseModel, ConfigDict, EmailStr, validator
 from fastapi import Body
-from sqlalchemy import func
+from sqlalchemy import func, select, insert, delete
 import uuid
 import os
 import re
@@ -41,7 +52,14 @@ class CustomerRegisterRequest(BaseModel):
     robotRunId: Optional[str] = None
 
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(info=tag("api"))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_write_db():
+    db = WriteSessionLocal(info=tag("api"))
     try:
         yield db
     finally:
@@ -114,6 +132,10 @@ class TripResponse(TripBase):
     id: str
     model_config = ConfigDict(from_attributes=True)
 
+class TripPage(BaseModel):
+    items: List[TripResponse]
+    next_cursor: Optional[str] = None
+
 class CaseBase(BaseModel):
     customer_id: str
     card_id: str
@@ -169,20 +191,45 @@ class FareDisputeResponse(FareDisputeBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
 
+class CardOverviewTotals(BaseModel):
+    trip_count: int
+    trip_fare_total: float
+    case_count: int
+    open_case_count: int
+    tap_count: int
+
+class CardOverviewResponse(BaseModel):
+    card: CardResponse
+    customer: Optional[CustomerResponse] = None
+    totals: CardOverviewTotals
+    recent_trips: List[TripResponse]
+    recent_cases: List[CaseResponse]
+    recent_taps: List[TapHistoryResponse]
+
 @router.get("/customers/", response_model=List[CustomerResponse])
-def get_customers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    customers = db.query(Customer).offset(skip).limit(limit).all()
-    return customers
+def get_customers(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
+    not_modified = conditional_get(db, request, response, "customers")
+    if not_modified:
+        return not_modified
+    query = keyset(db.query(*row_columns(CustomerResponse, Customer)), cursor, Customer.id)
+    if not cursor:
+        query = query.offset(skip)
+    customers = query.limit(limit).all()
+    set_next_cursor(response, customers, limit, "id")
+    return rows_response(customers, CustomerResponse, response)
 
 @router.get("/customers/{customer_id}", response_model=CustomerResponse)
-def get_customer(customer_id: str, db: Session = Depends(get_db)):
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+def get_customer(customer_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "customers")
+    if not_modified:
+        return not_modified
+    customer = cached_customer(db, customer_id)
     if customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
 @router.post("/customers/", response_model=CustomerResponse)
-def create_customer(customer: CustomerCreate, db: Session = Depends(get_db)):
+def create_customer(customer: CustomerCreate, db: Session = Depends(get_write_db)):
     try:
         existing_customer = db.query(Customer).filter(
             (Customer.email == customer.email) | (Customer.name == customer.name)
@@ -195,11 +242,12 @@ def create_customer(customer: CustomerCreate, db: Session = Depends(get_db)):
             )
         
         db_customer = Customer(
-            id=f"C{str(len(db.query(Customer).all()) + 1).zfill(3)}",
+            id=next_id(db, "customer"),
             **customer.dict(),
             join_date=datetime.now()
         )
         db.add(db_customer)
+        bump(db, total_customers=1)
         db.commit()
         db.refresh(db_customer)
         return db_customer
@@ -210,7 +258,7 @@ def create_customer(customer: CustomerCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to create customer: {str(e)}")
 
 @router.put("/customers/{customer_id}", response_model=CustomerResponse)
-def update_customer(customer_id: str, customer: CustomerUpdate, db: Session = Depends(get_db)):
+def update_customer(customer_id: str, customer: CustomerUpdate, db: Session = Depends(get_write_db)):
     db_customer = db.query(Customer).filter(Customer.id == customer_id).first()
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -223,29 +271,83 @@ def update_customer(customer_id: str, customer: CustomerUpdate, db: Session = De
     return db_customer
 
 @router.delete("/customers/{customer_id}")
-def delete_customer(customer_id: str, db: Session = Depends(get_db)):
-    db_customer = db.query(Customer).filter(Customer.id == customer_id).first()
+@query_budget(12)
+def delete_customer(customer_id: str, db: Session = Depends(get_write_db)):
+    # Load everything the cascade will touch up front instead of one query per card.
+    db_customer = (
+        db.query(Customer)
+        .options(selectinload(Customer.cards).selectinload(Card.trips), selectinload(Customer.cases))
+        .filter(Customer.id == customer_id)
+        .first()
+    )
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    # Cards, their trips and cases go with the customer through the ORM cascade;
+    # tap history only has a database-level cascade, so remove it explicitly.
+    taps_deleted = db.execute(delete(TapHistory).where(TapHistory.customer_id == customer_id)).rowcount
+    bump(
+        db,
+        total_customers=-1,
+        total_cards=-len(db_customer.cards),
+        total_trips=-sum(len(card.trips) for card in db_customer.cards),
+        total_balance=-sum(card.balance or 0 for card in db_customer.cards),
+        total_cases=-len(db_customer.cases),
+        total_tap_entries=-taps_deleted,
+    )
     db.delete(db_customer)
     db.commit()
     return {"message": "Customer deleted successfully"}
 
 @router.get("/cards/", response_model=List[CardResponse])
-def get_cards(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    cards = db.query(Card).offset(skip).limit(limit).all()
-    return cards
+def get_cards(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
+    not_modified = conditional_get(db, request, response, "cards")
+    if not_modified:
+        return not_modified
+    query = keyset(db.query(*row_columns(CardResponse, Card)), cursor, Card.id)
+    if not cursor:
+        query = query.offset(skip)
+    cards = query.limit(limit).all()
+    set_next_cursor(response, cards, limit, "id")
+    return rows_response(cards, CardResponse, response)
+
+@router.get("/cards/random")
+def get_random_card(
+    count: int = Query(1, ge=1, le=1000),
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    min_balance: Optional[float] = None,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(verify_api_key)
+):
+    """Get random cards without scanning the cards table; count=1 keeps the single-card shape"""
+    cards = card_sampler.sample(db, count=count, status=status, card_type=type, min_balance=min_balance)
+    if not cards:
+        raise HTTPException(status_code=404, detail="No cards found in database")
+    
+    sampled = [{
+        "id": card.id,
+        "card_number": card.id,
+        "balance": card.balance,
+        "status": card.status,
+        "type": card.type
+    } for card in cards]
+    if count == 1:
+        return sampled[0]
+    return {"cards": sampled, "count": len(sampled)}
 
 @router.get("/cards/{card_id}", response_model=CardResponse)
-def get_card(card_id: str, db: Session = Depends(get_db)):
-    card = db.query(Card).filter(Card.id == card_id).first()
+def get_card(card_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "cards")
+    if not_modified:
+        return not_modified
+    card = cached_card(db, card_id)
     if card is None:
         raise HTTPException(status_code=404, detail="Card not found")
     return card
 
 @router.post("/cards/", response_model=CardResponse)
-def create_card(card: CardCreate, db: Session = Depends(get_db)):
+def create_card(card: CardCreate, db: Session = Depends(get_write_db)):
     try:
         existing_card = db.query(Card).filter(Card.id == card.id).first()
         if existing_card:
@@ -272,6 +374,7 @@ def create_card(card: CardCreate, db: Session = Depends(get_db)):
             issue_date=issue_date
         )
         db.add(db_card)
+        bump(db, total_cards=1, total_balance=card.balance or 0)
         db.commit()
         db.refresh(db_card)
         return db_card
@@ -282,12 +385,16 @@ def create_card(card: CardCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to create card: {str(e)}")
 
 @router.put("/cards/{card_id}", response_model=CardResponse)
-def update_card(card_id: str, card: CardUpdate, db: Session = Depends(get_db)):
-    db_card = db.query(Card).filter(Card.id == card_id).first()
+def update_card(card_id: str, card: CardUpdate, db: Session = Depends(get_write_db)):
+    # Locked so the adjustment is measured against the balance it replaces.
+    db_card = db.query(Card).filter(Card.id == card_id).with_for_update().first()
     if db_card is None:
         raise HTTPException(status_code=404, detail="Card not found")
     
-    for key, value in card.dict().items():
+    # Balance changes go through the ledger like any other; the remaining
+    # fields are plain column updates.
+    apply_delta(db, card_id, card.balance - (db_card.balance or 0), "adjustment")
+    for key, value in card.dict(exclude={"balance"}).items():
         setattr(db_card, key, value)
     
     db.commit()
@@ -295,29 +402,105 @@ def update_card(card_id: str, card: CardUpdate, db: Session = Depends(get_db)):
     return db_card
 
 @router.delete("/cards/{card_id}")
-def delete_card(card_id: str, db: Session = Depends(get_db)):
-    db_card = db.query(Card).filter(Card.id == card_id).first()
+@query_budget(9)
+def delete_card(card_id: str, db: Session = Depends(get_write_db)):
+    db_card = db.query(Card).options(selectinload(Card.trips)).filter(Card.id == card_id).first()
     if db_card is None:
         raise HTTPException(status_code=404, detail="Card not found")
     
+    # Trips go with the card through the ORM cascade; the card's cases only
+    # have a database-level cascade, so remove (and count) them explicitly.
+    cases_deleted = db.execute(delete(Case).where(Case.card_id == card_id)).rowcount
+    bump(
+        db,
+        total_cards=-1,
+        total_balance=-(db_card.balance or 0),
+        total_trips=-len(db_card.trips),
+        total_cases=-cases_deleted,
+    )
     db.delete(db_card)
     db.commit()
     return {"message": "Card deleted successfully"}
 
 @router.get("/trips/", response_model=List[TripResponse])
-def get_trips(skip: int = 0, db: Session = Depends(get_db)):
-    trips = db.query(Trip).offset(skip).all()
+def get_trips(request: Request, response: Response, skip: int = 0, limit: Optional[int] = None, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "trips")
+    if not_modified:
+        return not_modified
+    query = keyset(db.query(Trip), cursor, Trip.id)
+    if not cursor:
+        query = query.offset(skip)
+    if limit:
+        query = query.limit(limit)
+    trips = query.all()
+    set_next_cursor(response, trips, limit, "id")
     return trips
 
+@router.get("/trips/search", response_model=TripPage)
+def search_trips(
+    request: Request,
+    response: Response,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_fare: Optional[float] = None,
+    max_fare: Optional[float] = None,
+    transit_mode: Optional[str] = None,
+    adjustable: Optional[str] = None,
+    operator: Optional[str] = None,
+    entry_location: Optional[str] = None,
+    exit_location: Optional[str] = None,
+    route: Optional[str] = None,
+    card_id: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Filtered trip search, newest first, paginated by (start_time, id)"""
+    not_modified = conditional_get(db, request, response, "trips")
+    if not_modified:
+        return not_modified
+    query = db.query(Trip)
+    if start_date:
+        query = query.filter(Trip.start_time >= start_date)
+    if end_date:
+        # A trip cannot start after it ends, so the start_time bound keeps the index range tight.
+        query = query.filter(Trip.start_time <= end_date, Trip.end_time <= end_date)
+    if min_fare is not None:
+        query = query.filter(Trip.fare >= min_fare)
+    if max_fare is not None:
+        query = query.filter(Trip.fare <= max_fare)
+    if transit_mode:
+        query = query.filter(Trip.transit_mode == transit_mode)
+    if adjustable:
+        query = query.filter(Trip.adjustable == adjustable)
+    if operator:
+        query = query.filter(Trip.operator == operator)
+    if entry_location:
+        query = query.filter(Trip.entry_location == entry_location)
+    if exit_location:
+        query = query.filter(func.lower(Trip.exit_location).contains(exit_location.lower()))
+    if route:
+        query = query.filter(func.lower(Trip.route).contains(route.lower()))
+    if card_id:
+        query = query.filter(Trip.card_id == card_id)
+    
+    query = keyset(query, cursor, Trip.start_time, Trip.id, descending=order == "desc")
+    trips = query.limit(limit).all()
+    return {"items": trips, "next_cursor": next_cursor(trips, limit, "start_time", "id")}
+
 @router.get("/trips/{trip_id}", response_model=TripResponse)
-def get_trip(trip_id: str, db: Session = Depends(get_db)):
+def get_trip(trip_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "trips")
+    if not_modified:
+        return not_modified
     trip = db.query(Trip).filter(Trip.id == trip_id).first()
     if trip is None:
         raise HTTPException(status_code=404, detail="Trip not found")
     return trip
 
 @router.post("/trips/", response_model=TripResponse)
-def create_trip(trip: TripCreate, db: Session = Depends(get_db)):
+def create_trip(trip: TripCreate, db: Session = Depends(get_write_db)):
     trip_data = trip.dict()
     trip_id = trip_data.pop('id', None)
     
@@ -325,17 +508,18 @@ def create_trip(trip: TripCreate, db: Session = Depends(get_db)):
         db_trip = Trip(id=trip_id, **trip_data)
     else:
         db_trip = Trip(
-            id=f"T{str(len(db.query(Trip).all()) + 1).zfill(3)}",
+            id=next_id(db, "trip"),
             **trip_data
         )
     
     db.add(db_trip)
+    bump(db, total_trips=1)
     db.commit()
     db.refresh(db_trip)
     return db_trip
 
 @router.put("/trips/{trip_id}", response_model=TripResponse)
-def update_trip(trip_id: str, trip: TripUpdate, db: Session = Depends(get_db)):
+def update_trip(trip_id: str, trip: TripUpdate, db: Session = Depends(get_write_db)):
     db_trip = db.query(Trip).filter(Trip.id == trip_id).first()
     if db_trip is None:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -348,42 +532,54 @@ def update_trip(trip_id: str, trip: TripUpdate, db: Session = Depends(get_db)):
     return db_trip
 
 @router.delete("/trips/{trip_id}")
-def delete_trip(trip_id: str, db: Session = Depends(get_db)):
+def delete_trip(trip_id: str, db: Session = Depends(get_write_db)):
     db_trip = db.query(Trip).filter(Trip.id == trip_id).first()
     if db_trip is None:
         raise HTTPException(status_code=404, detail="Trip not found")
     
+    bump(db, total_trips=-1)
     db.delete(db_trip)
     db.commit()
     return {"message": "Trip deleted successfully"}
 
 @router.get("/cases/", response_model=List[CaseResponse])
-def get_cases(db: Session = Depends(get_db)):
-    cases = db.query(Case).order_by(Case.created_date.desc()).all()
-    return cases
+def get_cases(request: Request, response: Response, limit: Optional[int] = None, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "cases")
+    if not_modified:
+        return not_modified
+    query = keyset(db.query(*row_columns(CaseResponse, Case)), cursor, Case.created_date, Case.id, descending=True)
+    if limit:
+        query = query.limit(limit)
+    cases = query.all()
+    set_next_cursor(response, cases, limit, "created_date", "id")
+    return rows_response(cases, CaseResponse, response)
 
 @router.get("/cases/{case_id}", response_model=CaseResponse)
-def get_case(case_id: str, db: Session = Depends(get_db)):
+def get_case(case_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "cases")
+    if not_modified:
+        return not_modified
     case = db.query(Case).filter(Case.id == case_id).first()
     if case is None:
         raise HTTPException(status_code=404, detail="Case not found")
     return case
 
 @router.post("/cases/", response_model=CaseResponse)
-def create_case(case: CaseCreate, db: Session = Depends(get_db)):
+def create_case(case: CaseCreate, db: Session = Depends(get_write_db)):
     db_case = Case(
-        id=f"CS{str(len(db.query(Case).all()) + 1).zfill(3)}",
+        id=next_id(db, "case"),
         **case.dict(),
         created_date=datetime.now(),
         last_updated=datetime.now()
     )
     db.add(db_case)
+    bump(db, total_cases=1)
     db.commit()
     db.refresh(db_case)
     return db_case
 
 @router.put("/cases/{case_id}", response_model=CaseResponse)
-def update_case(case_id: str, case: CaseUpdate, db: Session = Depends(get_db)):
+def update_case(case_id: str, case: CaseUpdate, db: Session = Depends(get_write_db)):
     db_case = db.query(Case).filter(Case.id == case_id).first()
     if db_case is None:
         raise HTTPException(status_code=404, detail="Case not found")
@@ -396,48 +592,82 @@ def update_case(case_id: str, case: CaseUpdate, db: Session = Depends(get_db)):
     return db_case
 
 @router.delete("/cases/{case_id}")
-def delete_case(case_id: str, db: Session = Depends(get_db)):
+def delete_case(case_id: str, db: Session = Depends(get_write_db)):
     db_case = db.query(Case).filter(Case.id == case_id).first()
     if db_case is None:
         raise HTTPException(status_code=404, detail="Case not found")
     
+    bump(db, total_cases=-1)
     db.delete(db_case)
     db.commit()
     return {"message": "Case deleted successfully"}
 
 @router.get("/tap-history/", response_model=List[TapHistoryResponse])
 def get_tap_history(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     customer_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(TapHistory)
+    not_modified = conditional_get(db, request, response, "tap_history")
+    if not_modified:
+        return not_modified
+    query = db.query(*row_columns(TapHistoryResponse, TapHistory))
     if customer_id:
         query = query.filter(TapHistory.customer_id == customer_id)
-    tap_history = query.offset(skip).limit(limit).all()
-    return tap_history
+    if start:
+        query = query.filter(TapHistory.tap_time >= start)
+    if end:
+        query = query.filter(TapHistory.tap_time < end)
+    page = keyset(query, cursor, TapHistory.tap_time, TapHistory.id, descending=True)
+    before = decode_cursor(cursor, datetime, str) if cursor else None
+    if cursor:
+        skip = 0
+    # Archived months are only read when the cursor or start reaches them;
+    # both sources then supply skip + limit rows and the merge is sliced.
+    if reaches_archive(db, before[0] if before else start):
+        archived = archived_taps(
+            db, list(TapHistoryResponse.model_fields), customer_id=customer_id, start=start, end=end,
+            before=before, limit=skip + limit
+        )
+        tap_history = newest_first(page.limit(skip + limit).all(), archived)[skip:skip + limit]
+    else:
+        tap_history = page.offset(skip).limit(limit).all()
+    set_next_cursor(response, tap_history, limit, "tap_time", "id")
+    return rows_response(tap_history, TapHistoryResponse, response)
 
 @router.get("/tap-history/{tap_id}", response_model=TapHistoryResponse)
-def get_tap_entry(tap_id: str, db: Session = Depends(get_db)):
+def get_tap_entry(tap_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "tap_history")
+    if not_modified:
+        return not_modified
     tap_entry = db.query(TapHistory).filter(TapHistory.id == tap_id).first()
     if tap_entry is None:
-        raise HTTPException(status_code=404, detail="Tap history entry not found")
+        archived = archived_tap(db, tap_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Tap history entry not found")
+        return archived._asdict()
     return tap_entry
 
 @router.post("/tap-history/", response_model=TapHistoryResponse)
-def create_tap_entry(tap_entry: TapHistoryCreate, db: Session = Depends(get_db)):
+def create_tap_entry(tap_entry: TapHistoryCreate, db: Session = Depends(get_write_db)):
     db_tap_entry = TapHistory(
-        id=f"TH{str(len(db.query(TapHistory).all()) + 1).zfill(6)}",
+        id=next_id(db, "tap_history"),
         **tap_entry.dict()
     )
     db.add(db_tap_entry)
+    bump(db, total_tap_entries=1)
     db.commit()
     db.refresh(db_tap_entry)
     return db_tap_entry
 
 @router.put("/tap-history/{tap_id}", response_model=TapHistoryResponse)
-def update_tap_entry(tap_id: str, tap_entry: TapHistoryUpdate, db: Session = Depends(get_db)):
+def update_tap_entry(tap_id: str, tap_entry: TapHistoryUpdate, db: Session = Depends(get_write_db)):
     db_tap_entry = db.query(TapHistory).filter(TapHistory.id == tap_id).first()
     if db_tap_entry is None:
         raise HTTPException(status_code=404, detail="Tap history entry not found")
@@ -450,22 +680,30 @@ def update_tap_entry(tap_id: str, tap_entry: TapHistoryUpdate, db: Session = Dep
     return db_tap_entry
 
 @router.delete("/tap-history/{tap_id}")
-def delete_tap_entry(tap_id: str, db: Session = Depends(get_db)):
+def delete_tap_entry(tap_id: str, db: Session = Depends(get_write_db)):
     db_tap_entry = db.query(TapHistory).filter(TapHistory.id == tap_id).first()
     if db_tap_entry is None:
         raise HTTPException(status_code=404, detail="Tap history entry not found")
     
+    bump(db, total_tap_entries=-1)
     db.delete(db_tap_entry)
     db.commit()
     return {"message": "Tap history entry deleted successfully"}
 
 @router.get("/fare-disputes/", response_model=List[FareDisputeResponse])
-def get_fare_disputes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    disputes = db.query(FareDispute).offset(skip).limit(limit).all()
+def get_fare_disputes(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    not_modified = conditional_get(db, request, response, "fare_disputes")
+    if not_modified:
+        return not_modified
+    query = keyset(db.query(FareDispute), cursor, FareDispute.id)
+    if not cursor:
+        query = query.offset(skip)
+    disputes = query.limit(limit).all()
+    set_next_cursor(response, disputes, limit, "id")
     return disputes
 
 @router.post("/fare-disputes/", response_model=FareDisputeResponse)
-def create_fare_dispute(dispute: FareDisputeCreate, db: Session = Depends(get_db)):
+def create_fare_dispute(dispute: FareDisputeCreate, db: Session = Depends(get_write_db)):
     db_dispute = FareDispute(
         dispute_date=dispute.dispute_date,
         card_id=dispute.card_id,
@@ -480,7 +718,7 @@ def create_fare_dispute(dispute: FareDisputeCreate, db: Session = Depends(get_db
     return db_dispute
 
 @router.put("/fare-disputes/{dispute_id}", response_model=FareDisputeResponse)
-def update_fare_dispute(dispute_id: int, dispute: FareDisputeCreate, db: Session = Depends(get_db)):
+def update_fare_dispute(dispute_id: int, dispute: FareDisputeCreate, db: Session = Depends(get_write_db)):
     db_dispute = db.query(FareDispute).filter(FareDispute.id == dispute_id).first()
     if db_dispute is None:
         raise HTTPException(status_code=404, detail="Fare Dispute not found")
@@ -491,7 +729,7 @@ def update_fare_dispute(dispute_id: int, dispute: FareDisputeCreate, db: Session
     return db_dispute
 
 @router.delete("/fare-disputes/{dispute_id}")
-def delete_fare_dispute(dispute_id: int, db: Session = Depends(get_db)):
+def delete_fare_dispute(dispute_id: int, db: Session = Depends(get_write_db)):
     db_dispute = db.query(FareDispute).filter(FareDispute.id == dispute_id).first()
     if db_dispute is None:
         raise HTTPException(status_code=404, detail="Fare Dispute not found")
@@ -508,11 +746,16 @@ class IssueCardRequest(BaseModel):
     load_product: Optional[str] = None
 
 @router.post("/api/cards/issue", response_model=StandardResponse)
-def issue_card_api(card_data: IssueCardRequest, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
+def issue_card_api(card_data: IssueCardRequest, idempotency_key: Optional[str] = Header(None), db: Session = Depends(get_write_db), api_key: str = Depends(verify_api_key)):
     transaction_id = str(uuid.uuid4())
     timestamp = datetime.now()
     
     try:
+        key = scoped_key(idempotency_key, None, "issue", card_data.card_id)
+        stored = claim_or_replay(db, key)
+        if stored:
+            return StandardResponse(**stored)
+        
         customer = db.query(Customer).filter(Customer.id == card_data.customer_id).first()
         if not customer:
             return StandardResponse(
@@ -543,14 +786,11 @@ def issue_card_api(card_data: IssueCardRequest, db: Session = Depends(get_db), a
             issue_date=datetime.fromisoformat(card_data.issue_date.replace('Z', '+00:00'))
         )
         db.add(db_card)
+        bump(db, total_cards=1, total_balance=card_data.balance)
         
         db.flush()
         
-        db.commit()
-        
-        db.refresh(db_card)
-        
-        return StandardResponse(
+        result = StandardResponse(
             status="success",
             timestamp=timestamp,
             transactionId=transaction_id,
@@ -564,7 +804,12 @@ def issue_card_api(card_data: IssueCardRequest, db: Session = Depends(get_db), a
                 "customer_name": customer.name
             }
         )
+        remember(db, key, result)
+        db.commit()
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         return StandardResponse(
@@ -580,13 +825,18 @@ class ProductAddRequest(BaseModel):
     value: float = 0.0
 
 @router.post("/api/cards/{card_id}/products", response_model=StandardResponse)
-def add_product_api(card_id: str, req: ProductAddRequest, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
+def add_product_api(card_id: str, req: ProductAddRequest, idempotency_key: Optional[str] = Header(None), db: Session = Depends(get_write_db), api_key: str = Depends(verify_api_key)):
     """Add a product to a card - POS API endpoint"""
     transaction_id = str(uuid.uuid4())
     timestamp = datetime.now()
     
     try:
-        card = db.query(Card).filter(Card.id == card_id).first()
+        key = scoped_key(idempotency_key, None, "products", card_id)
+        stored = claim_or_replay(db, key)
+        if stored:
+            return StandardResponse(**stored)
+        
+        card = apply_delta(db, card_id, req.value if req.value > 0 else 0.0, "product", reference=req.product)
         if not card:
             return StandardResponse(
                 status="error",
@@ -596,13 +846,7 @@ def add_product_api(card_id: str, req: ProductAddRequest, db: Session = Depends(
                 data={"card_id": card_id}
             )
         
-        if req.value > 0:
-            card.balance += req.value
-        
-        db.commit()
-        db.refresh(card)
-        
-        return StandardResponse(
+        result = StandardResponse(
             status="success",
             timestamp=timestamp,
             transactionId=transaction_id,
@@ -614,8 +858,14 @@ def add_product_api(card_id: str, req: ProductAddRequest, db: Session = Depends(
                 "value_added": req.value
             }
         )
+        remember(db, key, result)
+        db.commit()
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         return StandardResponse(
             status="error",
             timestamp=timestamp,
@@ -628,36 +878,38 @@ class ReloadRequest(BaseModel):
     amount: float
 
 @router.post("/api/cards/{card_id}/reload", response_model=StandardResponse)
-def reload_card_api(card_id: str, req: ReloadRequest, db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
+@query_budget(10)
+def reload_card_api(card_id: str, req: ReloadRequest, idempotency_key: Optional[str] = Header(None), db: Session = Depends(get_write_db), api_key: str = Depends(verify_api_key)):
     """Reload funds onto a card - POS API endpoint"""
     transaction_id = str(uuid.uuid4())
     timestamp = datetime.now()
     
     try:
-        card = db.query(Card).filter(Card.id == card_id).first()
-        if not card:
+        if req.amount <= 0:
             return StandardResponse(
                 status="error",
                 timestamp=timestamp,
                 transactionId=transaction_id,
-                message="Card not found",
-                data={"card_id": card_id}
+                message="Amount must be positive",
+                data={"card_id": card_id, "amount": req.amount}
             )
         
-        if req.amount <= 0:
+        key = scoped_key(idempotency_key, None, "reload", card_id)
+        stored = claim_or_replay(db, key)
+        if stored:
+            return StandardResponse(**stored)
+        
+        card = apply_delta(db, card_id, req.amount, "reload")
+        if not card:
             return StandardResponse(
                 status="error",
                 timestamp=timestamp,
                 transactionId=transaction_id,
-                message="Amount must be positive",
-                data={"card_id": card_id, "amount": req.amount}
+                message="Card not found",
+                data={"card_id": card_id}
             )
         
-        card.balance += req.amount
-        db.commit()
-        db.refresh(card)
-        
-        return StandardResponse(
+        result = StandardResponse(
             status="success",
             timestamp=timestamp,
             transactionId=transaction_id,
@@ -669,8 +921,14 @@ def reload_card_api(card_id: str, req: ReloadRequest, db: Session = Depends(get_
                 "previous_balance": card.balance - req.amount
             }
         )
+        remember(db, key, result)
+        db.commit()
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         return StandardResponse(
             status="error",
             timestamp=timestamp,
@@ -679,38 +937,68 @@ def reload_card_api(card_id: str, req: ReloadRequest, db: Session = Depends(get_
             data={"card_id": card_id}
         )
 
-@router.get("/cards/random")
-def get_random_card(db: Session = Depends(get_db), api_key: str = Depends(verify_api_key)):
-    """Get a random card from the database"""
-    import random
-    cards = db.query(Card).all()
-    if not cards:
-        raise HTTPException(status_code=404, detail="No cards found in database")
+OPEN_CASE_STATUSES = ("Open", "In Progress", "Pending")
+
+@router.get("/cards/{card_id}/overview", response_model=CardOverviewResponse)
+@query_budget(6)
+def get_card_overview(card_id: str, recent: int = Query(5, ge=1, le=100), db: Session = Depends(get_db)):
+    """Card, owner, totals and latest activity in a handful of bounded, indexed queries"""
+    row = db.query(Card, Customer).outerjoin(Customer, Customer.id == Card.customer_id).filter(Card.id == card_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    card, customer = row
+    
+    totals = db.execute(select(
+        select(func.count()).select_from(Trip).where(Trip.card_id == card_id).scalar_subquery(),
+        select(func.coalesce(func.sum(Trip.fare), 0.0)).where(Trip.card_id == card_id).scalar_subquery(),
+        select(func.count()).select_from(Case).where(Case.customer_id == card.customer_id).scalar_subquery(),
+        select(func.count()).select_from(Case).where(
+            Case.customer_id == card.customer_id, Case.case_status.in_(OPEN_CASE_STATUSES)
+        ).scalar_subquery(),
+        select(func.count()).select_from(TapHistory).where(TapHistory.customer_id == card.customer_id).scalar_subquery(),
+    )).one()
+    
+    recent_trips = db.query(Trip).filter(Trip.card_id == card_id).order_by(Trip.start_time.desc()).limit(recent).all()
+    recent_cases = db.query(Case).filter(Case.customer_id == card.customer_id).order_by(Case.created_date.desc()).limit(recent).all()
+    recent_taps = (
+        db.query(TapHistory)
+        .filter(TapHistory.customer_id == card.customer_id)
+        .order_by(TapHistory.tap_time.desc(), TapHistory.id.desc())
+        .limit(recent)
+        .all()
+    )
     
-    random_card = random.choice(cards)
     return {
-        "id": random_card.id,
-        "card_number": random_card.id,
-        "balance": random_card.balance,
-        "status": random_card.status,
-        "type": random_card.type
+        "card": card,
+        "customer": customer,
+        "totals": {
+            "trip_count": totals[0],
+            "trip_fare_total": round(totals[1], 2),
+            "case_count": totals[2],
+            "open_case_count": totals[3],
+            "tap_count": totals[4]
+        },
+        "recent_trips": recent_trips,
+        "recent_cases": recent_cases,
+        "recent_taps": recent_taps
     }
 
 @router.get("/cards/{card_id}/balance")
+@query_budget(2)
 def get_card_balance(card_id: str, db: Session = Depends(get_db)):
     """Get card balance"""
-    card = db.query(Card).filter(Card.id == card_id).first()
+    card = cached_card(db, card_id)
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     return {
-        "card_id": card.id,
-        "balance": card.balance,
-        "status": card.status,
-        "type": card.type
+        "card_id": card["id"],
+        "balance": card["balance"],
+        "status": card["status"],
+        "type": card["type"]
     }
 
 @router.post("/cards/issue", response_model=CardResponse)
-def issue_card(card_data: IssueCardRequest, db: Session = Depends(get_db)):
+def issue_card(card_data: IssueCardRequest, db: Session = Depends(get_write_db)):
     customer = db.query(Customer).filter(Customer.id == card_data.customer_id).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -728,21 +1016,18 @@ def issue_card(card_data: IssueCardRequest, db: Session = Depends(get_db)):
         issue_date=datetime.fromisoformat(card_data.issue_date.replace('Z', '+00:00'))
     )
     db.add(db_card)
+    bump(db, total_cards=1, total_balance=card_data.balance)
     db.commit()
     db.refresh(db_card)
     return db_card
 
 @router.post("/cards/{card_id}/products")
-def add_product(card_id: str, req: ProductAddRequest, db: Session = Depends(get_db)):
-    card = db.query(Card).filter(Card.id == card_id).first()
+def add_product(card_id: str, req: ProductAddRequest, db: Session = Depends(get_write_db)):
+    card = apply_delta(db, card_id, req.value if req.value > 0 else 0.0, "product", reference=req.product)
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     
-    if req.value > 0:
-        card.balance += req.value
-    
     db.commit()
-    db.refresh(card)
     return {
         "message": f"Product {req.product} added to card {card_id}",
         "card_id": card.id,
@@ -750,17 +1035,15 @@ def add_product(card_id: str, req: ProductAddRequest, db: Session = Depends(get_
     }
 
 @router.post("/cards/{card_id}/reload")
-def reload_card(card_id: str, req: ReloadRequest, db: Session = Depends(get_db)):
-    card = db.query(Card).filter(Card.id == card_id).first()
-    if not card:
-        raise HTTPException(status_code=404, detail="Card not found")
-    
+def reload_card(card_id: str, req: ReloadRequest, db: Session = Depends(get_write_db)):
     if req.amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be positive")
     
-    card.balance += req.amount
+    card = apply_delta(db, card_id, req.amount, "reload")
+    if not card:
+        raise HTTPException(status_code=404, detail="Card not found")
+    
     db.commit()
-    db.refresh(card)
     return {
         "message": f"Card {card_id} reloaded with ${req.amount}",
         "card_id": card.id,
@@ -773,22 +1056,20 @@ class PaymentSimRequest(BaseModel):
     method: str
 
 @router.post("/payment/simulate")
-def simulate_payment(req: PaymentSimRequest, db: Session = Depends(get_db)):
-    card = db.query(Card).filter(Card.id == req.card_id).first()
+def simulate_payment(req: PaymentSimRequest, db: Session = Depends(get_write_db)):
+    card = apply_delta(db, req.card_id, -req.amount, "payment", reference=req.method, min_balance=0.0)
     if not card:
-        raise HTTPException(status_code=404, detail="Card not found")
-    
-    if card.balance < req.amount:
+        current_balance = db.execute(select(Card.balance).where(Card.id == req.card_id)).scalar()
+        if current_balance is None:
+            raise HTTPException(status_code=404, detail="Card not found")
         return {
             "success": False,
             "message": "Insufficient balance",
-            "current_balance": card.balance,
+            "current_balance": current_balance,
             "required_amount": req.amount
         }
     
-    card.balance -= req.amount
     db.commit()
-    db.refresh(card)
     
     return {
         "success": True,
@@ -799,14 +1080,32 @@ def simulate_payment(req: PaymentSimRequest, db: Session = Depends(get_db)):
     }
 
 @router.get("/cards/{card_id}/transactions")
-def get_card_transactions(card_id: str, db: Session = Depends(get_db)):
+def get_card_transactions(
+    card_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tap_limit: int = 500,
+    db: Session = Depends(get_db)
+):
     card = db.query(Card).filter(Card.id == card_id).first()
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     
     trips = db.query(Trip).filter(Trip.card_id == card_id).order_by(Trip.start_time.desc()).all()
     
-    tap_history = db.query(TapHistory).filter(TapHistory.customer_id == card.customer_id).order_by(TapHistory.tap_time.desc()).all()
+    taps = db.query(TapHistory).filter(TapHistory.customer_id == card.customer_id)
+    if start:
+        taps = taps.filter(TapHistory.tap_time >= start)
+    if end:
+        taps = taps.filter(TapHistory.tap_time < end)
+    tap_history = taps.order_by(TapHistory.tap_time.desc(), TapHistory.id.desc()).limit(tap_limit).all()
+    # Archived months are only read when start reaches them.
+    if reaches_archive(db, start):
+        tap_history = newest_first(
+            tap_history,
+            archived_taps(db, customer_id=card.customer_id, start=start, end=end, limit=tap_limit),
+            limit=tap_limit
+        )
     
     return {
         "card_id": card_id,
@@ -834,21 +1133,19 @@ def get_card_transactions(card_id: str, db: Session = Depends(get_db)):
     }
 
 @router.get("/reports/summary")
-def get_reports_summary(db: Session = Depends(get_db)):
-    total_cards = db.query(func.count(Card.id)).scalar()
-    total_customers = db.query(func.count(Customer.id)).scalar()
-    total_trips = db.query(func.count(Trip.id)).scalar()
-    total_balance = db.query(func.sum(Card.balance)).scalar() or 0.0
-    total_cases = db.query(func.count(Case.id)).scalar()
-    total_tap_entries = db.query(func.count(TapHistory.id)).scalar()
+def get_reports_summary(exact: bool = False, db: Session = Depends(get_db)):
+    """Dashboard totals from the maintained counters; exact=true recounts the tables"""
+    totals = None if exact else read_counters(db)
+    if not totals or any(name not in totals for name in COUNTERS):
+        totals = compute_exact(db)
     
     return {
-        "total_cards": total_cards,
-        "total_customers": total_customers,
-        "total_trips": total_trips,
-        "total_balance": round(total_balance, 2),
-        "total_cases": total_cases,
-        "total_tap_entries": total_tap_entries,
+        "total_cards": int(totals["total_cards"]),
+        "total_customers": int(totals["total_customers"]),
+        "total_trips": int(totals["total_trips"]),
+        "total_balance": round(totals["total_balance"], 2),
+        "total_cases": int(totals["total_cases"]),
+        "total_tap_entries": int(totals["total_tap_entries"]),
         "generated_at": datetime.now().isoformat()
     }
 
@@ -859,21 +1156,24 @@ class CardTapRequest(BaseModel):
     transit_mode: str
     direction: str
 
+TAP_FARE = 2.50
+TAP_BATCH_LOOKUP_SIZE = 500
+
 @router.post("/simulate/cardTap")
-def simulate_card_tap(req: CardTapRequest, db: Session = Depends(get_db)):
-    card = db.query(Card).filter(Card.id == req.card_id).first()
-    if not card:
-        raise HTTPException(status_code=404, detail="Card not found")
-    
-    min_fare = 2.50
-    if card.balance < min_fare:
-        result = "Insufficient Balance"
-    else:
+@query_budget(8)
+def simulate_card_tap(req: CardTapRequest, db: Session = Depends(get_write_db)):
+    tap_id = next_id(db, "tap_history")
+    card = apply_delta(db, req.card_id, -TAP_FARE, "tap", reference=tap_id, min_balance=0.0)
+    if card:
         result = "Tap Successful"
-        card.balance -= min_fare
+    else:
+        card = db.execute(select(Card.id, Card.balance, Card.customer_id).where(Card.id == req.card_id)).first()
+        if not card:
+            raise HTTPException(status_code=404, detail="Card not found")
+        result = "Insufficient Balance"
     
     tap_entry = TapHistory(
-        id=f"TH{str(len(db.query(TapHistory).all()) + 1).zfill(6)}",
+        id=tap_id,
         tap_time=datetime.now(),
         location=req.location,
         device_id=req.device_id,
@@ -884,6 +1184,7 @@ def simulate_card_tap(req: CardTapRequest, db: Session = Depends(get_db)):
     )
     
     db.add(tap_entry)
+    bump(db, total_tap_entries=1)
     db.commit()
     db.refresh(tap_entry)
     
@@ -898,13 +1199,134 @@ def simulate_card_tap(req: CardTapRequest, db: Session = Depends(get_db)):
         "tap_time": tap_entry.tap_time.isoformat()
     }
 
+@router.post("/simulate/cardTaps/batch")
+def simulate_card_taps_batch(reqs: List[CardTapRequest], db: Session = Depends(get_write_db)):
+    """Apply a burst of gate taps in one transaction; results come back in input order"""
+    card_ids = sorted({req.card_id for req in reqs})
+    cards = {}
+    for i in range(0, len(card_ids), TAP_BATCH_LOOKUP_SIZE):
+        chunk = card_ids[i:i + TAP_BATCH_LOOKUP_SIZE]
+        for row in db.execute(select(Card.id, Card.balance, Card.customer_id).where(Card.id.in_(chunk))):
+            cards[row.id] = row
+    
+    known = [req for req in reqs if req.card_id in cards]
+    tap_ids = iter(next_ids(db, "tap_history", len(known)))
+    balances = {card_id: row.balance for card_id, row in cards.items()}
+    charged = {}
+    tap_rows = []
+    results = []
+    tap_time = datetime.now()
+    
+    for req in reqs:
+        card = cards.get(req.card_id)
+        if card is None:
+            results.append({
+                "tap_id": None,
+                "card_id": req.card_id,
+                "result": "Card not found",
+                "location": req.location,
+                "transit_mode": req.transit_mode,
+                "direction": req.direction,
+                "remaining_balance": None,
+                "tap_time": None
+            })
+            continue
+        
+        if balances[req.card_id] < TAP_FARE:
+            result = "Insufficient Balance"
+        else:
+            result = "Tap Successful"
+            balances[req.card_id] -= TAP_FARE
+        
+        tap_id = next(tap_ids)
+        tap_row = {
+            "id": tap_id,
+            "tap_time": tap_time,
+            "location": req.location,
+            "device_id": req.device_id,
+            "transit_mode": req.transit_mode,
+            "direction": req.direction,
+            "customer_id": card.customer_id,
+            "result": result
+        }
+        tap_rows.append(tap_row)
+        results.append({
+            "tap_id": tap_id,
+            "card_id": req.card_id,
+            "result": result,
+            "location": req.location,
+            "transit_mode": req.transit_mode,
+            "direction": req.direction,
+            "remaining_balance": balances[req.card_id],
+            "tap_time": tap_time.isoformat()
+        })
+        if result == "Tap Successful":
+            charged.setdefault(req.card_id, []).append((results[-1], tap_row))
+    
+    try:
+        entries = []
+        # Debit in card ID order, so concurrent batches sharing cards take
+        # their row locks in the same order and cannot deadlock.
+        for card_id in sorted(charged):
+            taps = charged[card_id]
+            card = apply_delta(db, card_id, -TAP_FARE * len(taps), "tap", min_balance=0.0, record=False)
+            if card:
+                balance = card.balance + TAP_FARE * len(taps)
+                for result, tap_row in taps:
+                    balance -= TAP_FARE
+                    result["remaining_balance"] = balance
+                    entries.append({"card_id": card_id, "delta": -TAP_FARE, "balance_after": balance,
+                                    "reason": "tap", "reference": tap_row["id"]})
+                continue
+            
+            # The balance moved since the snapshot; charge this card tap by tap.
+            for result, tap_row in taps:
+                card = apply_delta(db, card_id, -TAP_FARE, "tap", min_balance=0.0, record=False)
+                if card:
+                    result["remaining_balance"] = card.balance
+                    entries.append({"card_id": card_id, "delta": -TAP_FARE, "balance_after": card.balance,
+                                    "reason": "tap", "reference": tap_row["id"]})
+                else:
+                    result["result"] = tap_row["result"] = "Insufficient Balance"
+                    result["remaining_balance"] = db.execute(select(Card.balance).where(Card.id == card_id)).scalar()
+        
+        append_entries(db, entries)
+        if tap_rows:
+            db.execute(insert(TapHistory), tap_rows)
+            bump(db, total_tap_entries=len(tap_rows))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Tap batch failed: {str(e)}")
+    
+    return {
+        "processed": len(results),
+        "successful": sum(1 for r in results if r["result"] == "Tap Successful"),
+        "results": results
+    }
+
 @router.post("/api/crm/cards/sync", response_model=StandardResponse)
-def sync_card_to_crm(req: CardSyncRequest, db: Session = Depends(get_db)):
+def sync_card_to_crm(req: CardSyncRequest, idempotency_key: Optional[str] = Header(None), db: Session = Depends(get_write_db)):
     transaction_id = str(uuid.uuid4())
     timestamp = datetime.now()
     
     try:
-        card = db.query(Card).filter(Card.id == req.card_id).first()
+        key = scoped_key(idempotency_key, req.robotRunId, "crm-sync", req.card_id, req.action)
+        stored = claim_or_replay(db, key)
+        if stored:
+            return StandardResponse(**stored)
+        
+        if req.action == "reload" and req.amount:
+            card = apply_delta(db, req.card_id, req.amount, "crm_reload", reference=req.robotRunId)
+            message = f"Card {req.card_id} reloaded with ${req.amount}"
+        elif req.action == "add_product" and req.product:
+            card = apply_delta(db, req.card_id, req.amount or 0.0, "crm_product",
+                               reference=req.robotRunId, product=req.product)
+            message = f"Product {req.product} added to card {req.card_id}"
+        else:
+            card = apply_delta(db, req.card_id, 0.0, "crm_sync")
+            message = f"Card {req.card_id} synced successfully"
+        
         if not card:
             return StandardResponse(
                 status="error",
@@ -915,21 +1337,7 @@ def sync_card_to_crm(req: CardSyncRequest, db: Session = Depends(get_db)):
                 data={"card_id": req.card_id}
             )
         
-        if req.action == "reload" and req.amount:
-            card.balance += req.amount
-            message = f"Card {req.card_id} reloaded with ${req.amount}"
-        elif req.action == "add_product" and req.product:
-            card.product = req.product
-            if req.amount:
-                card.balance += req.amount
-            message = f"Product {req.product} added to card {req.card_id}"
-        else:
-            message = f"Card {req.card_id} synced successfully"
-        
-        db.commit()
-        db.refresh(card)
-        
-        return StandardResponse(
+        result = StandardResponse(
             status="success",
             timestamp=timestamp,
             transactionId=transaction_id,
@@ -942,8 +1350,14 @@ def sync_card_to_crm(req: CardSyncRequest, db: Session = Depends(get_db)):
                 "product": card.product
             }
         )
+        remember(db, key, result)
+        db.commit()
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         return StandardResponse(
             status="error",
             timestamp=timestamp,
@@ -954,7 +1368,7 @@ def sync_card_to_crm(req: CardSyncRequest, db: Session = Depends(get_db)):
         )
 
 @router.post("/api/crm/customers/{customer_id}/register", response_model=StandardResponse)
-def register_card_to_customer(customer_id: str, req: CustomerRegisterRequest, db: Session = Depends(get_db)):
+def register_card_to_customer(customer_id: str, req: CustomerRegisterRequest, db: Session = Depends(get_write_db)):
     transaction_id = str(uuid.uuid4())
     timestamp = datetime.now()
     
@@ -1009,13 +1423,150 @@ def register_card_to_customer(customer_id: str, req: CustomerRegisterRequest, db
             data={"card_id": req.card_id, "customer_id": customer_id}
         )
 
+CRM_BATCH_LOOKUP_SIZE = 1000
+
+def lookup_by_id(db: Session, ids, *columns):
+    """Rows for `ids` keyed by the first column, in as few IN queries as the batch size allows"""
+    ids = list(set(ids))
+    rows = {}
+    for i in range(0, len(ids), CRM_BATCH_LOOKUP_SIZE):
+        for row in db.execute(select(*columns).where(columns[0].in_(ids[i:i + CRM_BATCH_LOOKUP_SIZE]))):
+            rows[row[0]] = row
+    return rows
+
+def batch_response(timestamp, transaction_id, reqs, results, label):
+    failed = sum(1 for r in results if r["result"] != "success")
+    run_ids = {req.robotRunId for req in reqs}
+    return StandardResponse(
+        status="success" if not failed else "error" if failed == len(results) else "partial",
+        timestamp=timestamp,
+        transactionId=transaction_id,
+        robotRunId=run_ids.pop() if len(run_ids) == 1 else None,
+        message=f"{label}: {len(results) - failed} of {len(results)} succeeded",
+        data={"processed": len(results), "succeeded": len(results) - failed, "failed": failed, "results": results}
+    )
+
+@router.post("/api/crm/cards/sync/batch", response_model=StandardResponse)
+def sync_cards_to_crm_batch(reqs: List[CardSyncRequest], idempotency_key: Optional[str] = Header(None), db: Session = Depends(get_write_db)):
+    """Sync many cards in one transaction; one balance update per card, results in input order"""
+    transaction_id = str(uuid.uuid4())
+    timestamp = datetime.now()
+    
+    try:
+        key = scoped_key(idempotency_key, None, "crm-sync-batch")
+        stored = claim_or_replay(db, key)
+        if stored:
+            return StandardResponse(**stored)
+        
+        cards = lookup_by_id(db, [req.card_id for req in reqs], Card.id, Card.product)
+        results = [None] * len(reqs)
+        planned = {}
+        for i, req in enumerate(reqs):
+            if req.card_id not in cards:
+                results[i] = {"card_id": req.card_id, "result": "error", "message": "Card not found in CRM"}
+                continue
+            if req.action == "reload" and req.amount:
+                item = (i, req, req.amount, None, "crm_reload", f"Card {req.card_id} reloaded with ${req.amount}")
+            elif req.action == "add_product" and req.product:
+                item = (i, req, req.amount or 0.0, req.product, "crm_product",
+                        f"Product {req.product} added to card {req.card_id}")
+            else:
+                item = (i, req, 0.0, None, "crm_sync", f"Card {req.card_id} synced successfully")
+            planned.setdefault(req.card_id, []).append(item)
+        
+        entries = []
+        # Update in card ID order, so concurrent batches sharing cards take
+        # their row locks in the same order and cannot deadlock.
+        for card_id in sorted(planned):
+            items = planned[card_id]
+            total = sum(item[2] for item in items)
+            products = [item[3] for item in items if item[3]]
+            values = {"product": products[-1]} if products else {}
+            card = apply_delta(db, card_id, total, "crm_batch", record=False, **values)
+            if card is None:
+                for i, req, *_ in items:
+                    results[i] = {"card_id": card_id, "result": "error", "message": "Card not found in CRM"}
+                continue
+            
+            # Replay the items on the balance from before the update for per-item results.
+            balance = card.balance - total
+            product = cards[card_id].product
+            for i, req, delta, item_product, reason, message in items:
+                balance += delta
+                product = item_product or product
+                if delta:
+                    entries.append({"card_id": card_id, "delta": delta, "balance_after": balance,
+                                    "reason": reason, "reference": req.robotRunId})
+                results[i] = {"card_id": card_id, "result": "success", "message": message,
+                              "balance": balance, "status": card.status, "product": product}
+        
+        append_entries(db, entries)
+        result = batch_response(timestamp, transaction_id, reqs, results, "Card sync")
+        remember(db, key, result)
+        db.commit()
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        return StandardResponse(
+            status="error",
+            timestamp=timestamp,
+            transactionId=transaction_id,
+            message=f"Batch sync failed: {str(e)}",
+            data={"processed": 0}
+        )
+
+@router.post("/api/crm/customers/register/batch", response_model=StandardResponse)
+def register_cards_to_customers_batch(reqs: List[CustomerRegisterRequest], db: Session = Depends(get_write_db)):
+    """Register many cards to their customers in one transaction, results in input order"""
+    transaction_id = str(uuid.uuid4())
+    timestamp = datetime.now()
+    
+    try:
+        customers = lookup_by_id(db, [req.customer_id for req in reqs], Customer.id, Customer.name)
+        card_ids = list({req.card_id for req in reqs})
+        cards = {}
+        for i in range(0, len(card_ids), CRM_BATCH_LOOKUP_SIZE):
+            for card in db.query(Card).filter(Card.id.in_(card_ids[i:i + CRM_BATCH_LOOKUP_SIZE])):
+                cards[card.id] = card
+        
+        results = []
+        for req in reqs:
+            customer = customers.get(req.customer_id)
+            card = cards.get(req.card_id)
+            if customer is None or card is None:
+                results.append({"card_id": req.card_id, "customer_id": req.customer_id, "result": "error",
+                                "message": "Customer not found" if customer is None else "Card not found"})
+                continue
+            card.customer_id = req.customer_id
+            results.append({"card_id": card.id, "customer_id": req.customer_id, "result": "success",
+                            "message": f"Card {req.card_id} registered to customer {req.customer_id}",
+                            "customer_name": customer.name, "card_status": card.status})
+        
+        # The flush sends the changed cards as one executemany UPDATE.
+        db.commit()
+        return batch_response(timestamp, transaction_id, reqs, results, "Registration")
+        
+    except Exception as e:
+        db.rollback()
+        return StandardResponse(
+            status="error",
+            timestamp=timestamp,
+            transactionId=transaction_id,
+            message=f"Batch registration failed: {str(e)}",
+            data={"processed": 0}
+        )
+
 @router.get("/api/crm/cards/{card_id}", response_model=StandardResponse)
+@query_budget(2)
 def get_crm_card_status(card_id: str, db: Session = Depends(get_db)):
     transaction_id = str(uuid.uuid4())
     timestamp = datetime.now()
     
     try:
-        card = db.query(Card).filter(Card.id == card_id).first()
+        card = cached_card(db, card_id)
         if not card:
             return StandardResponse(
                 status="error",
@@ -1025,7 +1576,7 @@ def get_crm_card_status(card_id: str, db: Session = Depends(get_db)):
                 data={"card_id": card_id}
             )
         
-        customer = db.query(Customer).filter(Customer.id == card.customer_id).first()
+        customer = cached_customer(db, card["customer_id"])
         
         return StandardResponse(
             status="success",
@@ -1033,14 +1584,14 @@ def get_crm_card_status(card_id: str, db: Session = Depends(get_db)):
             transactionId=transaction_id,
             message="Card status retrieved successfully",
             data={
-                "card_id": card.id,
-                "balance": card.balance,
-                "status": card.status,
-                "type": card.type,
-                "product": card.product,
-                "issue_date": card.issue_date.isoformat(),
-                "customer_id": card.customer_id,
-                "customer_name": customer.name if customer else None
+                "card_id": card["id"],
+                "balance": card["balance"],
+                "status": card["status"],
+                "type": card["type"],
+                "product": card["product"],
+                "issue_date": card["issue_date"].isoformat(),
+                "customer_id": card["customer_id"],
+                "customer_name": customer["name"] if customer else None
             }
         )
         
@@ -1054,12 +1605,13 @@ def get_crm_card_status(card_id: str, db: Session = Depends(get_db)):
         )
 
 @router.get("/api/crm/customers/{customer_id}", response_model=StandardResponse)
+@query_budget(2)
 def get_crm_customer_status(customer_id: str, db: Session = Depends(get_db)):
     transaction_id = str(uuid.uuid4())
     timestamp = datetime.now()
     
     try:
-        customer = db.query(Customer).filter(Customer.id == customer_id).first()
+        customer = cached_customer(db, customer_id)
         if not customer:
             return StandardResponse(
                 status="error",
@@ -1069,7 +1621,7 @@ def get_crm_customer_status(customer_id: str, db: Session = Depends(get_db)):
                 data={"customer_id": customer_id}
             )
         
-        cards = db.query(Card).filter(Card.customer_id == customer_id).all()
+        cards = cached_customer_cards(db, customer_id)
         
         return StandardResponse(
             status="success",
@@ -1077,21 +1629,21 @@ def get_crm_customer_status(customer_id: str, db: Session = Depends(get_db)):
             transactionId=transaction_id,
             message="Customer status retrieved successfully",
             data={
-                "customer_id": customer.id,
-                "name": customer.name,
-                "email": customer.email,
-                "phone": customer.phone,
-                "address": customer.address,
-                "join_date": customer.join_date.isoformat(),
+                "customer_id": customer["id"],
+                "name": customer["name"],
+                "email": customer["email"],
+                "phone": customer["phone"],
+                "address": customer.get("address"),
+                "join_date": customer["join_date"].isoformat(),
                 "cards": [{
-                    "card_id": card.id,
-                    "balance": card.balance,
-                    "status": card.status,
-                    "type": card.type,
-                    "product": card.product
+                    "card_id": card["id"],
+                    "balance": card["balance"],
+                    "status": card["status"],
+                    "type": card["type"],
+                    "product": card["product"]
                 } for card in cards],
                 "total_cards": len(cards),
-                "total_balance": sum(card.balance for card in cards)
+                "total_balance": sum(card["balance"] for card in cards)
             }
         )
         
@@ -0,0 +1,185 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime
+from database import get_async_db, get_async_write_db
+from models import Card, TapHistory
+from ids import next_id
+from ledger import apply_delta
+from sampling import card_sampler
+from cache import cached_card, cached_customer
+from etags import conditional_get
+from stats import bump, compute_exact, read_counters, COUNTERS
+from api import (
+    verify_api_key,
+    CustomerResponse,
+    CardResponse,
+    ReloadRequest,
+    PaymentSimRequest,
+    CardTapRequest,
+    TAP_FARE,
+)
+
+# Async versions of the hottest routes in api.py. main.py includes this
+# router ahead of the sync one when DB_ASYNC is set, so these paths shadow
+# their sync twins and every other route keeps running on the threadpool.
+# The shared helpers (ID allocation, ledger updates, sampling, counters)
+# take a sync Session and run here through AsyncSession.run_sync.
+router = APIRouter()
+
+@router.get("/customers/{customer_id}", response_model=CustomerResponse)
+async def get_customer(customer_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    not_modified = await db.run_sync(conditional_get, request, response, "customers")
+    if not_modified:
+        return not_modified
+    customer = await db.run_sync(cached_customer, customer_id)
+    if customer is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return customer
+
+# Declared before /cards/{card_id} so "random" is not taken for a card ID.
+@router.get("/cards/random")
+async def get_random_card(
+    count: int = Query(1, ge=1, le=1000),
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    min_balance: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db),
+    api_key: str = Depends(verify_api_key)
+):
+    """Get random cards without scanning the cards table; count=1 keeps the single-card shape"""
+    cards = await db.run_sync(card_sampler.sample, count=count, status=status, card_type=type, min_balance=min_balance)
+    if not cards:
+        raise HTTPException(status_code=404, detail="No cards found in database")
+
+    sampled = [{
+        "id": card.id,
+        "card_number": card.id,
+        "balance": card.balance,
+        "status": card.status,
+        "type": card.type
+    } for card in cards]
+    if count == 1:
+        return sampled[0]
+    return {"cards": sampled, "count": len(sampled)}
+
+@router.get("/cards/{card_id}", response_model=CardResponse)
+async def get_card(card_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    not_modified = await db.run_sync(conditional_get, request, response, "cards")
+    if not_modified:
+        return not_modified
+    card = await db.run_sync(cached_card, card_id)
+    if card is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return card
+
+@router.get("/cards/{card_id}/balance")
+async def get_card_balance(card_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get card balance"""
+    card = await db.run_sync(cached_card, card_id)
+    if not card:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return {
+        "card_id": card["id"],
+        "balance": card["balance"],
+        "status": card["status"],
+        "type": card["type"]
+    }
+
+@router.post("/cards/{card_id}/reload")
+async def reload_card(card_id: str, req: ReloadRequest, db: AsyncSession = Depends(get_async_write_db)):
+    if req.amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be positive")
+
+    card = await db.run_sync(apply_delta, card_id, req.amount, "reload")
+    if not card:
+        raise HTTPException(status_code=404, detail="Card not found")
+
+    await db.commit()
+    return {
+        "message": f"Card {card_id} reloaded with ${req.amount}",
+        "card_id": card.id,
+        "new_balance": card.balance
+    }
+
+@router.post("/payment/simulate")
+async def simulate_payment(req: PaymentSimRequest, db: AsyncSession = Depends(get_async_write_db)):
+    card = await db.run_sync(apply_delta, req.card_id, -req.amount, "payment", reference=req.method, min_balance=0.0)
+    if not card:
+        current_balance = (await db.execute(select(Card.balance).where(Card.id == req.card_id))).scalar()
+        if current_balance is None:
+            raise HTTPException(status_code=404, detail="Card not found")
+        return {
+            "success": False,
+            "message": "Insufficient balance",
+            "current_balance": current_balance,
+            "required_amount": req.amount
+        }
+
+    await db.commit()
+
+    return {
+        "success": True,
+        "message": f"Payment of ${req.amount} by {req.method} successful",
+        "card_id": card.id,
+        "new_balance": card.balance,
+        "payment_method": req.method
+    }
+
+@router.get("/reports/summary")
+async def get_reports_summary(exact: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Dashboard totals from the maintained counters; exact=true recounts the tables"""
+    totals = None if exact else await db.run_sync(read_counters)
+    if not totals or any(name not in totals for name in COUNTERS):
+        totals = await db.run_sync(compute_exact)
+
+    return {
+        "total_cards": int(totals["total_cards"]),
+        "total_customers": int(totals["total_customers"]),
+        "total_trips": int(totals["total_trips"]),
+        "total_balance": round(totals["total_balance"], 2),
+        "total_cases": int(totals["total_cases"]),
+        "total_tap_entries": int(totals["total_tap_entries"]),
+        "generated_at": datetime.now().isoformat()
+    }
+
+@router.post("/simulate/cardTap")
+async def simulate_card_tap(req: CardTapRequest, db: AsyncSession = Depends(get_async_write_db)):
+    tap_id = await db.run_sync(next_id, "tap_history")
+    card = await db.run_sync(apply_delta, req.card_id, -TAP_FARE, "tap", reference=tap_id, min_balance=0.0)
+    if card:
+        result = "Tap Successful"
+    else:
+        card = (await db.execute(
+            select(Card.id, Card.balance, Card.customer_id).where(Card.id == req.card_id)
+        )).first()
+        if not card:
+            raise HTTPException(status_code=404, detail="Card not found")
+        result = "Insufficient Balance"
+
+    tap_entry = TapHistory(
+        id=tap_id,
+        tap_time=datetime.now(),
+        location=req.location,
+        device_id=req.device_id,
+        transit_mode=req.transit_mode,
+        direction=req.direction,
+        customer_id=card.customer_id,
+        result=result
+    )
+
+    db.add(tap_entry)
+    bump(db, total_tap_entries=1)
+    await db.commit()
+
+    return {
+        "tap_id": tap_entry.id,
+        "card_id": req.card_id,
+        "result": result,
+        "location": req.location,
+        "transit_mode": req.transit_mode,
+        "direction": req.direction,
+        "remaining_balance": card.balance,
+        "tap_time": tap_entry.tap_time.isoformat()
+    }
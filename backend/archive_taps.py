@@ -0,0 +1,33 @@
+"""Move tap history older than the retention window into Parquet archives.
+
+    python archive_taps.py                        # keep TAP_RETENTION_MONTHS (default 12)
+    python archive_taps.py --retention-months 6
+
+Run it from cron, e.g. nightly; a run with nothing to archive is a couple
+of cheap queries. Each month older than the window is written to
+TAP_ARCHIVE_DIR as a zstd-compressed Parquet file, listed in tap_archives
+and deleted from the database; on PostgreSQL its emptied partition is then
+dropped. /tap-history/, /tap-history/{id} and /cards/{id}/transactions
+keep serving archived taps from the files (the list routes when ?start=
+reaches back into archived months). Needs pyarrow.
+"""
+import argparse
+
+from tap_archive import TAP_ARCHIVE_DIR, TAP_RETENTION_MONTHS, archive_expired
+
+def print_entry(entry):
+    print(f"  {entry['month']}: {entry['row_count']} taps -> {entry['file']}")
+
+def main(retention_months=TAP_RETENTION_MONTHS):
+    print(f"Archiving tap history older than {retention_months} month(s) to {TAP_ARCHIVE_DIR}...")
+    archived = archive_expired(retention_months, progress=print_entry)
+    total = sum(entry["row_count"] for entry in archived)
+    print(f"Archived {total} taps from {len(archived)} month(s).")
+    return archived
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive tap history older than the retention window")
+    parser.add_argument("--retention-months", type=int, default=TAP_RETENTION_MONTHS,
+                        help="months kept in the database, the current one included")
+    args = parser.parse_args()
+    main(**vars(args))
@@ -0,0 +1,123 @@
+"""Login storm vs. POS and tap latency: bcrypt on the shared threadpool vs. the password pool.
+
+Run from backend/:
+    python -m benchmarks.bench_auth --logins 32 --duration 15
+    python -m benchmarks.bench_auth --rounds 10 --password-workers 2,4
+
+For each configuration (PASSWORD_WORKERS=0 runs bcrypt inline on the
+threadpool, as before the pool existed) a fresh uvicorn server is started
+and measured twice: POS/tap traffic alone, then the same traffic while
+--logins connections log in back to back. Reports login throughput and
+the p50/p99 of the POS and tap endpoints in both phases.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime
+
+from benchmarks.common import use_database
+from benchmarks.loadgen import Connection, free_port, run_load, start_server, stop_server, summarize
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--scale", type=float, default=4, help="generate_data scale (50 customers per unit)")
+parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS for the server")
+parser.add_argument("--password-workers", default="0,2", help="PASSWORD_WORKERS values to compare")
+parser.add_argument("--users", type=int, default=50, help="accounts created before the storm")
+parser.add_argument("--logins", type=int, default=32, help="connections logging in during the storm")
+parser.add_argument("--concurrency", type=int, default=16, help="connections sending POS/tap traffic")
+parser.add_argument("--duration", type=float, default=15.0, help="seconds per phase")
+args = parser.parse_args()
+
+url = use_database(name="bench_auth.db")
+
+import generate_data  # noqa: E402
+from database import engine  # noqa: E402
+
+API_KEY = {"x-api-key": "mysecretkey"}
+PASSWORD = "correct horse battery staple"
+
+
+def user(n):
+    return {"email": f"agent{n}@example.com", "password": PASSWORD, "name": f"Agent {n}"}
+
+
+def traffic(customers):
+    rng = random.Random(7)
+
+    def next_request(_):
+        card_id = f"4716{rng.randrange(1, customers + 1):012d}"
+        roll = rng.random()
+        if roll < 0.4:
+            return "GET", f"/cards/{card_id}/balance", None, None, "GET /cards/{id}/balance"
+        if roll < 0.6:
+            return ("POST", f"/api/cards/{card_id}/reload", {"amount": 5.0}, API_KEY,
+                    "POST /api/cards/{id}/reload")
+        return ("POST", "/simulate/cardTap", {"card_id": card_id, "location": "Central Station",
+                "device_id": "Gate 101", "transit_mode": "Rail", "direction": "Entry"},
+                None, "POST /simulate/cardTap")
+    return next_request
+
+
+def storm(customers):
+    pos = traffic(customers)
+    rng = random.Random(11)
+
+    def next_request(index):
+        if index < args.logins:
+            credentials = user(rng.randrange(args.users))
+            return ("POST", "/auth/login", {"email": credentials["email"], "password": PASSWORD}, None,
+                    "POST /auth/login")
+        return pos(index)
+    return next_request
+
+
+async def create_users(port):
+    connection = Connection("127.0.0.1", port)
+    try:
+        for n in range(args.users):
+            status, _, _ = await connection.request("POST", "/auth/signup", user(n))
+            if status not in (200, 400):
+                raise RuntimeError(f"signup returned {status}")
+    finally:
+        await connection.close()
+
+
+def measure(port, next_request, concurrency):
+    by_label = {}
+    outcome = asyncio.run(run_load("127.0.0.1", port, next_request, concurrency, args.duration, by_label=by_label))
+    return {label: summarize(b["latencies"], b["errors"], b["statuses"], outcome[3])
+            for label, b in sorted(by_label.items())}
+
+
+def main():
+    print(f"Generating dataset (scale {args.scale})...")
+    generate_data.main(scale=args.scale, seed=42, workers=1, as_of=datetime(2025, 1, 1))
+    engine.dispose()
+    customers = int(generate_data.CONFIG['CUSTOMERS_PER_SCALE'] * args.scale)
+
+    results = {}
+    for workers in args.password_workers.split(","):
+        port = free_port()
+        process = start_server({"DATABASE_URL": url, "BCRYPT_ROUNDS": str(args.rounds),
+                                "PASSWORD_WORKERS": workers}, port)
+        try:
+            asyncio.run(create_users(port))
+            quiet = measure(port, traffic(customers), args.concurrency)
+            loaded = measure(port, storm(customers), args.concurrency + args.logins)
+        finally:
+            stop_server(process)
+        results[workers] = {"quiet": quiet, "storm": loaded}
+
+    print(f"\nbcrypt rounds {args.rounds}, {args.logins} login connections, "
+          f"{args.concurrency} POS/tap connections, {args.duration:.0f}s per phase")
+    print(f"{'workers':>7} {'endpoint':<30} {'quiet p50':>10} {'quiet p99':>10} "
+          f"{'storm p50':>10} {'storm p99':>10} {'storm req/s':>12}")
+    for workers, phases in results.items():
+        for label, r in phases["storm"].items():
+            q = phases["quiet"].get(label)
+            quiet_cols = f"{q['p50_ms']:10.2f} {q['p99_ms']:10.2f}" if q else f"{'-':>10} {'-':>10}"
+            print(f"{workers:>7} {label:<30} {quiet_cols} {r['p50_ms']:10.2f} {r['p99_ms']:10.2f} {r['rps']:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
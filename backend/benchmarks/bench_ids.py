@@ -0,0 +1,88 @@
+"""Insert latency of tap_history as the table grows: legacy len(all())+1 IDs vs. the ID allocator.
+
+Run from backend/:
+    python -m benchmarks.bench_ids --rows 2000000 --step 250000
+
+Legacy samples are rolled back so the table size only changes through the
+filler rows; allocator samples are committed like a real request would.
+"""
+import argparse
+from datetime import datetime
+
+from benchmarks.common import use_database, percentile, timed
+
+use_database(name="bench_ids.db")
+
+from sqlalchemy import insert  # noqa: E402
+from database import SessionLocal, engine, Base  # noqa: E402
+from models import Customer, TapHistory  # noqa: E402
+from ids import next_id  # noqa: E402
+
+
+def tap_row(tap_id, customer_id):
+    return {
+        "id": tap_id,
+        "tap_time": datetime.now(),
+        "location": "Central Station",
+        "device_id": "Gate 100",
+        "transit_mode": "Rail",
+        "direction": "Entry",
+        "customer_id": customer_id,
+        "result": "Tap Successful",
+    }
+
+
+def fill(db, start, stop, customer_id, batch=50000):
+    # Filler rows use a prefix neither ID scheme produces.
+    for lo in range(start, stop, batch):
+        hi = min(stop, lo + batch)
+        db.execute(insert(TapHistory), [tap_row(f"F{n:09d}", customer_id) for n in range(lo, hi)])
+        db.commit()
+
+
+def legacy_insert(db, customer_id):
+    tap_id = f"TH{str(len(db.query(TapHistory).all()) + 1).zfill(6)}"
+    db.add(TapHistory(**tap_row(tap_id, customer_id)))
+    db.flush()
+    db.rollback()
+
+
+def allocator_insert(db, customer_id):
+    db.add(TapHistory(**tap_row(next_id(db, "tap_history"), customer_id)))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--step", type=int, default=100000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--legacy-samples", type=int, default=3)
+    parser.add_argument("--legacy-max-rows", type=int, default=500000,
+                        help="stop sampling the legacy scheme above this table size")
+    args = parser.parse_args()
+
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(Customer(id="BENCH1", name="Bench", email="bench@example.com",
+                    phone="0", notifications="Email Enabled", join_date=datetime.now()))
+    db.commit()
+
+    print(f"{'rows':>10} {'legacy p50 ms':>14} {'alloc p50 ms':>13} {'alloc p99 ms':>13}")
+    size = 0
+    while size <= args.rows:
+        legacy = []
+        if size <= args.legacy_max_rows:
+            legacy = [timed(legacy_insert, db, "BENCH1")[0] for _ in range(args.legacy_samples)]
+        alloc = [timed(allocator_insert, db, "BENCH1")[0] for _ in range(args.samples)]
+        legacy_p50 = f"{percentile(legacy, 50):14.3f}" if legacy else f"{'skipped':>14}"
+        print(f"{size:>10} {legacy_p50} {percentile(alloc, 50):13.3f} {percentile(alloc, 99):13.3f}")
+
+        fill(db, size, size + args.step, "BENCH1")
+        size += args.step
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
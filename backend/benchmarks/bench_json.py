@@ -0,0 +1,107 @@
+"""List response cost on 10k-row pages: FastAPI's response_model path vs. rows_response.
+
+Run from backend/:
+    python -m benchmarks.bench_json --rows 10000 --repeat 20
+
+Fills tap_history with --rows entries and then builds the same JSON page
+three ways, timing the query and the serialization separately:
+
+  response_model  ORM objects, validated and dumped the way FastAPI does
+                  for response_model=List[...], then json.dumps
+  validated       column select + rows_response (pydantic-core validation)
+  trusted         column select + rows_response(trusted=True), orjson
+                  when installed
+
+The three bodies are checked to decode to the same data.
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks.common import use_database, percentile, timed
+
+use_database(name="bench_json.db")
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from database import SessionLocal, engine, Base  # noqa: E402
+from models import Customer, TapHistory  # noqa: E402
+from api import TapHistoryResponse  # noqa: E402
+from fastjson import orjson, row_columns, rows_response  # noqa: E402
+
+adapter = TypeAdapter(List[TapHistoryResponse])
+
+
+def fill(db, rows):
+    db.add(Customer(id="BENCH1", name="Bench", email="bench@example.com",
+                    phone="0", notifications="Email Enabled", join_date=datetime.now()))
+    start = datetime(2025, 1, 1)
+    db.execute(insert(TapHistory), [{
+        "id": f"TH{n:06d}",
+        "tap_time": start + timedelta(seconds=n),
+        "location": "Central Station",
+        "device_id": f"Gate {100 + n % 20}",
+        "transit_mode": "Rail",
+        "direction": "Entry" if n % 2 else "Exit",
+        "customer_id": "BENCH1",
+        "result": "Tap Successful",
+    } for n in range(rows)])
+    db.commit()
+
+
+def response_model_body(objects):
+    # What fastapi.routing.serialize_response does for response_model, then JSONResponse.
+    content = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    fill(db, args.rows)
+
+    def orm_rows():
+        db.expunge_all()
+        return db.query(TapHistory).order_by(TapHistory.tap_time.desc()).all()
+
+    def column_rows():
+        return db.query(*row_columns(TapHistoryResponse, TapHistory)).order_by(TapHistory.tap_time.desc()).all()
+
+    paths = {
+        "response_model": (orm_rows, response_model_body),
+        "validated": (column_rows, lambda rows: rows_response(rows, TapHistoryResponse, trusted=False).body),
+        "trusted": (column_rows, lambda rows: rows_response(rows, TapHistoryResponse, trusted=True).body),
+    }
+
+    print(f"{args.rows} rows, encoder: {'orjson' if orjson else 'stdlib json'}")
+    print(f"{'path':<16} {'query p50 ms':>13} {'encode p50 ms':>14} {'total p50 ms':>13} {'speedup':>8}")
+    bodies = {}
+    baseline = None
+    for name, (load, encode) in paths.items():
+        query_ms, encode_ms = [], []
+        for _ in range(args.repeat):
+            ms, rows = timed(load)
+            query_ms.append(ms)
+            ms, bodies[name] = timed(encode, rows)
+            encode_ms.append(ms)
+        total = percentile(query_ms, 50) + percentile(encode_ms, 50)
+        baseline = baseline or total
+        print(f"{name:<16} {percentile(query_ms, 50):13.2f} {percentile(encode_ms, 50):14.2f} "
+              f"{total:13.2f} {baseline / total:7.1f}x")
+
+    reference = json.loads(bodies["response_model"])
+    for name, body in bodies.items():
+        if json.loads(body) != reference:
+            raise SystemExit(f"{name} produced a different body than response_model")
+    print("All bodies decode to the same data.")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
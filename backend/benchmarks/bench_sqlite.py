@@ -0,0 +1,130 @@
+"""Mixed read/write load on SQLite: default settings vs. the WAL profile with a single-writer queue.
+
+Run from backend/:
+    python -m benchmarks.bench_sqlite --concurrency 8,32,128 --write-share 0.2,0.5
+
+Seeds a scratch SQLite file, then starts uvicorn on it twice, once with
+SQLITE_PROFILE=0 (rollback journal, default pool, writers racing for the
+lock) and once with the profile from database.py. At each concurrency
+and write share it replays the same request mix against the existing
+endpoints. Reads are card balances, customer reads and a customer's tap
+history. Writes are gate taps, reloads and payments. It reports
+throughput, latency and how many requests failed (5xx, usually
+"database is locked").
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+from datetime import datetime
+
+from benchmarks.common import use_database
+from benchmarks.loadgen import free_port, run_load, start_server, stop_server, summarize
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--customers", type=int, default=5000)
+parser.add_argument("--concurrency", default="8,32,128")
+parser.add_argument("--write-share", default="0.2,0.5", help="comma-separated fractions of write requests")
+parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+args = parser.parse_args()
+
+url = use_database(name="bench_sqlite.db")
+
+from sqlalchemy import insert  # noqa: E402
+from database import SessionLocal, engine, write_engine, Base  # noqa: E402
+from models import Customer, Card  # noqa: E402
+from ids import ensure_counters  # noqa: E402
+from stats import reconcile  # noqa: E402
+
+NOW = datetime(2025, 1, 1)
+
+
+def seed():
+    engine.echo = False
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    n = args.customers
+    with SessionLocal() as db:
+        db.execute(insert(Customer), [{
+            "id": f"CUST{i:07d}", "name": f"Customer {i}", "email": f"c{i}@example.com",
+            "phone": "555-0100", "notifications": "Email Enabled", "join_date": NOW,
+        } for i in range(n)])
+        db.execute(insert(Card), [{
+            "id": f"4716{i:012d}", "type": "Bank Card", "status": "ACTIVE", "balance": 1000000.0,
+            "customer_id": f"CUST{i:07d}", "issue_date": NOW,
+        } for i in range(n)])
+        db.commit()
+        reconcile(db)
+    ensure_counters(engine)
+    engine.dispose()
+    write_engine.dispose()
+
+
+def set_journal_mode(mode):
+    # journal_mode=WAL is persistent in the file, so the baseline run has to
+    # switch it back explicitly.
+    connection = sqlite3.connect(url[len("sqlite:///"):])
+    connection.execute(f"PRAGMA journal_mode={mode}")
+    connection.close()
+
+
+def make_request_mix(write_share):
+    rng = random.Random(5)
+    n = args.customers
+
+    def next_request(_):
+        i = rng.randrange(n)
+        card_id, customer_id = f"4716{i:012d}", f"CUST{i:07d}"
+        if rng.random() < write_share:
+            kind = rng.random()
+            if kind < 0.6:
+                return "POST", "/simulate/cardTap", {
+                    "card_id": card_id, "location": "Downtown", "device_id": "Gate 101",
+                    "transit_mode": "Rail", "direction": "Entry",
+                }, None
+            if kind < 0.8:
+                return "POST", f"/cards/{card_id}/reload", {"amount": 5.0}, None
+            return "POST", "/payment/simulate", {"card_id": card_id, "amount": 1.0, "method": "Credit"}, None
+        kind = rng.random()
+        if kind < 0.5:
+            return "GET", f"/cards/{card_id}/balance", None, None
+        if kind < 0.8:
+            return "GET", f"/customers/{customer_id}", None, None
+        return "GET", f"/tap-history/?customer_id={customer_id}&limit=20", None, None
+
+    return next_request
+
+
+def failures(result):
+    return result["errors"] + sum(v for k, v in result["statuses"].items() if k.startswith("5"))
+
+
+def main():
+    seed()
+    levels = [int(c) for c in args.concurrency.split(",")]
+    shares = [float(s) for s in args.write_share.split(",")]
+    results = {}
+    for profile, flag in (("default", "0"), ("wal+queue", "1")):
+        set_journal_mode("WAL" if flag == "1" else "DELETE")
+        port = free_port()
+        server = start_server({"DATABASE_URL": url, "SQLITE_PROFILE": flag}, port)
+        try:
+            for share in shares:
+                for concurrency in levels:
+                    outcome = asyncio.run(run_load(
+                        "127.0.0.1", port, make_request_mix(share), concurrency, args.duration))
+                    results[(profile, share, concurrency)] = summarize(*outcome)
+        finally:
+            stop_server(server)
+
+    print(f"{'profile':<10} {'writes':>6} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>9} {'failed':>7}")
+    for share in shares:
+        for concurrency in levels:
+            for profile in ("default", "wal+queue"):
+                r = results[(profile, share, concurrency)]
+                print(f"{profile:<10} {share:6.0%} {concurrency:5d} {r['rps']:9.1f} "
+                      f"{r['p50_ms']:8.2f} {r['p99_ms']:9.2f} {failures(r):7d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def use_database(url=None, name="bench.db"):
+    """Point the backend at a scratch database before `database` is first imported.
+
+    Returns the URL in use. Without an explicit URL a fresh SQLite file is
+    created in a temporary directory.
+    """
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="crm-bench-"), name)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    if "database" in sys.modules:
+        raise RuntimeError("use_database() must run before the database module is imported")
+    return url
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000.0, result
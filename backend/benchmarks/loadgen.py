@@ -0,0 +1,168 @@
+"""Minimal asyncio HTTP/1.1 load generator shared by the HTTP benchmarks.
+
+Uses only the standard library: each worker holds one keep-alive
+connection and issues requests back to back, so the client side stays
+cheap enough to saturate a single uvicorn worker.
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, percentile
+
+
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = b"" if body is None else json.dumps(body).encode()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(payload)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            data = b"".join(chunks)
+        else:
+            data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status, response_headers, data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+
+async def run_load(host, port, next_request, concurrency, duration, by_label=None):
+    """Drive `concurrency` workers for `duration` seconds.
+
+    `next_request(worker_index)` returns (method, path, body, headers) and
+    optionally a fifth element labelling the endpoint; it is called once
+    per request. Returns latencies in ms, the error count, the status
+    histogram and the wall time. When `by_label` is a dict, each label's
+    latencies, errors and statuses are also collected into it.
+    """
+    latencies = []
+    statuses = {}
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        nonlocal errors
+        connection = Connection(host, port)
+        while time.perf_counter() < deadline:
+            method, path, body, headers, *label = next_request(index)
+            bucket = None
+            if by_label is not None:
+                bucket = by_label.setdefault(label[0] if label else f"{method} {path}",
+                                             {"latencies": [], "errors": 0, "statuses": {}})
+            start = time.perf_counter()
+            try:
+                status, _, _ = await connection.request(method, path, body, headers)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                if bucket is not None:
+                    bucket["errors"] += 1
+                await connection.close()
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            latencies.append(elapsed_ms)
+            statuses[status] = statuses.get(status, 0) + 1
+            if bucket is not None:
+                bucket["latencies"].append(elapsed_ms)
+                bucket["statuses"][status] = bucket["statuses"].get(status, 0) + 1
+        await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors, statuses, time.perf_counter() - started
+
+
+def summarize(latencies, errors, statuses, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies) if latencies else 0.0,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(env, port, workers=1):
+    """Start uvicorn on main:app in a subprocess and wait until it accepts requests."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--no-access-log", "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start within 60s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
@@ -0,0 +1,282 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Callable, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from models import Card, Customer
+
+# ENTITY_CACHE picks the backend for card and customer reads: "memory"
+# (per-process LRU, the default), "redis" (shared between workers, needs
+# the redis package and ENTITY_CACHE_URL) or "off". Writes invalidate the
+# entries they touch when their transaction commits; with the memory
+# backend and several workers, the other workers' copies live until
+# ENTITY_CACHE_TTL runs out.
+ENTITY_CACHE = os.getenv("ENTITY_CACHE", "memory").lower()
+ENTITY_CACHE_URL = os.getenv("ENTITY_CACHE_URL", "redis://localhost:6379/0")
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "5"))
+
+_INVALIDATE_KEY = "cache_invalidate"
+_STRIPES = 1024
+
+cards_table = Card.__table__
+customers_table = Customer.__table__
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+class _Backend:
+    """Read-through logic shared by the backends.
+
+    A load that overlaps an invalidation of the same key must not store
+    what it read, or a value from before the write could outlive it. Keys
+    hash onto a fixed set of generation counters; invalidation bumps the
+    key's counter and a load only stores if the counter did not move.
+    """
+    name = "none"
+
+    def __init__(self):
+        self.stats = CacheStats()
+        self._generations = [0] * _STRIPES
+        self._generation_lock = threading.Lock()
+
+    def get_or_load(self, key: str, loader: Callable):
+        value = self._get(key)
+        if value is not None:
+            self.stats.add(hits=1)
+            return value
+        self.stats.add(misses=1)
+        stripe = hash(key) % _STRIPES
+        generation = self._generations[stripe]
+        value = loader()
+        if value is not None:
+            with self._generation_lock:
+                if self._generations[stripe] == generation:
+                    self._set(key, value)
+        return value
+
+    def put(self, key: str, value) -> None:
+        """Store a value known to be current, e.g. one just committed"""
+        self._set(key, value)
+
+    def invalidate(self, keys) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        with self._generation_lock:
+            for key in keys:
+                self._generations[hash(key) % _STRIPES] += 1
+        self._delete(keys)
+        self.stats.add(invalidations=len(keys))
+
+    def snapshot(self) -> dict:
+        return {"backend": self.name, **self.stats.snapshot()}
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value) -> None:
+        pass
+
+    def _delete(self, keys) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryCache(_Backend):
+    """In-process LRU with a time-to-live per entry"""
+    name = "memory"
+
+    def __init__(self, maxsize: int = ENTITY_CACHE_SIZE, ttl: float = ENTITY_CACHE_TTL):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value) -> None:
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.stats.add(evictions=evicted)
+
+    def _delete(self, keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {**super().snapshot(), "size": size, "maxsize": self.maxsize, "ttl_seconds": self.ttl}
+
+
+class RedisCache(_Backend):
+    """Cache shared by every worker through Redis; entries expire after the TTL"""
+    name = "redis"
+    prefix = "crm:entity:"
+
+    def __init__(self, url: str = ENTITY_CACHE_URL, ttl: float = ENTITY_CACHE_TTL):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("ENTITY_CACHE=redis needs the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def _get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def _set(self, key, value) -> None:
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(self.ttl * 1000))
+
+    def _delete(self, keys) -> None:
+        self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*", count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+
+def _build_cache() -> _Backend:
+    if ENTITY_CACHE == "memory":
+        return MemoryCache()
+    if ENTITY_CACHE == "redis":
+        return RedisCache()
+    if ENTITY_CACHE in ("off", "none", "0", "false"):
+        return _Backend()
+    raise RuntimeError(f"Unknown ENTITY_CACHE backend {ENTITY_CACHE!r}")
+
+
+entity_cache = _build_cache()
+
+
+def card_key(card_id: str) -> str:
+    return f"card:{card_id}"
+
+
+def customer_key(customer_id: str) -> str:
+    return f"customer:{customer_id}"
+
+
+def customer_cards_key(customer_id: str) -> str:
+    return f"customer-cards:{customer_id}"
+
+
+def cached_card(db: Session, card_id: str) -> Optional[dict]:
+    """Card columns as a dict, or None when the card does not exist"""
+    def load():
+        row = db.execute(select(cards_table).where(cards_table.c.id == card_id)).mappings().first()
+        return dict(row) if row is not None else None
+    return entity_cache.get_or_load(card_key(card_id), load)
+
+
+def cached_customer(db: Session, customer_id: str) -> Optional[dict]:
+    """Customer columns as a dict, or None when the customer does not exist"""
+    def load():
+        row = db.execute(select(customers_table).where(customers_table.c.id == customer_id)).mappings().first()
+        return dict(row) if row is not None else None
+    return entity_cache.get_or_load(customer_key(customer_id), load)
+
+
+def cached_customer_cards(db: Session, customer_id: str) -> List[dict]:
+    """All cards of a customer as dicts, in ID order"""
+    def load():
+        rows = db.execute(
+            select(cards_table).where(cards_table.c.customer_id == customer_id).order_by(cards_table.c.id)
+        ).mappings()
+        return [dict(row) for row in rows]
+    return entity_cache.get_or_load(customer_cards_key(customer_id), load)
+
+
+def invalidate(db: Session, *keys: str) -> None:
+    """Drop `keys` from the cache once the session's transaction commits"""
+    db.info.setdefault(_INVALIDATE_KEY, set()).update(keys)
+
+
+def invalidate_card(db: Session, card_id: str, customer_id: Optional[str] = None) -> None:
+    invalidate(db, card_key(card_id))
+    if customer_id is not None:
+        invalidate(db, customer_cards_key(customer_id))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_orm_writes(session, flush_context):
+    # ORM writes are picked up here; Core statements (ledger.apply_delta,
+    # bulk inserts) call invalidate() themselves.
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Card):
+            invalidate_card(session, obj.id, obj.customer_id)
+            # A card moved to another customer leaves the old one's list too.
+            for old_customer_id in inspect(obj).attrs.customer_id.history.deleted:
+                if old_customer_id is not None:
+                    invalidate(session, customer_cards_key(old_customer_id))
+        elif isinstance(obj, Customer):
+            invalidate(session, customer_key(obj.id), customer_cards_key(obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    keys = session.info.pop(_INVALIDATE_KEY, None)
+    if keys:
+        entity_cache.invalidate(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop(_INVALIDATE_KEY, None)
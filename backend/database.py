@@ -1,25 +1,148 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from pool_metrics import InstrumentedQueuePool, pool_snapshot
+import logging
 import os
+import time
+
+def env_flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_ASYNC = env_flag("DB_ASYNC", "")
+
+# Engine settings. Statement timeouts cut slow queries off instead of
+# letting requests pile up behind the pool; 0 disables them.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "true")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "crm-backend")
+# INFO logs every statement (what echo=True used to do), DEBUG adds result rows.
+DB_LOG_LEVEL = os.getenv("DB_LOG_LEVEL", "WARNING").upper()
+
+sql_logger = logging.getLogger("sqlalchemy.engine")
+sql_logger.setLevel(DB_LOG_LEVEL)
+if sql_logger.level < logging.WARNING and not sql_logger.handlers:
+    sql_logger.addHandler(logging.StreamHandler())
 
 if DATABASE_URL:
     SQLALCHEMY_DATABASE_URL = DATABASE_URL
-    connect_args = {}
 else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     DATABASE_FILE = "transit_card.db"
     DATABASE_PATH = os.path.join(BASE_DIR, DATABASE_FILE)
     SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+IS_POSTGRES = SQLALCHEMY_DATABASE_URL.startswith("postgres")
+# SQLITE_PROFILE=0 falls back to plain SQLite defaults (for comparison runs).
+SQLITE_TUNED = IS_SQLITE and env_flag("SQLITE_PROFILE", "1")
+
+# SQLite production profile. WAL lets readers run alongside the writer,
+# synchronous=NORMAL is durable across application crashes under WAL, and
+# busy_timeout makes a connection wait for a lock instead of failing with
+# "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # KiB, i.e. 64 MB per connection
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+if IS_SQLITE:
     connect_args = {"check_same_thread": False}
+elif IS_POSTGRES:
+    connect_args = {"application_name": DB_APPLICATION_NAME}
+    if DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+else:
+    connect_args = {}
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args=connect_args,
-    echo=True
-)
+pool_args = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def install_sqlite_statement_timeout(engine):
+    """Abort SQLite statements that run past DB_STATEMENT_TIMEOUT_MS.
+
+    SQLite has no server-side timeout, so each statement records a deadline
+    on its connection and a progress handler interrupts the VM once it is
+    passed. The caller sees an OperationalError ("interrupted").
+    """
+    timeout = DB_STATEMENT_TIMEOUT_MS / 1000.0
+
+    @event.listens_for(engine, "connect")
+    def set_progress_handler(dbapi_connection, connection_record):
+        if not hasattr(dbapi_connection, "set_progress_handler"):
+            return
+        info = connection_record.info
+
+        def check_deadline():
+            deadline = info.get("statement_deadline")
+            return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+        dbapi_connection.set_progress_handler(check_deadline, 10000)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement_clock(conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get("no_statement_timeout"):
+            conn.info["statement_deadline"] = time.monotonic() + timeout
+
+    @event.listens_for(engine, "checkin")
+    def clear_statement_clock(dbapi_connection, connection_record):
+        connection_record.info.pop("statement_deadline", None)
+        connection_record.info.pop("no_statement_timeout", None)
+
+def without_statement_timeout(conn):
+    """Lift the statement timeout for the rest of this connection's transaction.
+
+    For maintenance work that is expected to run long: migrations, counter
+    reconciliation and streaming exports.
+    """
+    if IS_POSTGRES:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+    conn.info["no_statement_timeout"] = True
+    conn.info.pop("statement_deadline", None)
+
+def build_engine(**overrides):
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        **{**pool_args, **overrides}
+    )
+    if SQLITE_TUNED:
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    if IS_SQLITE and DB_STATEMENT_TIMEOUT_MS:
+        install_sqlite_statement_timeout(engine)
+    return engine
+
+engine = build_engine()
+
+# SQLite allows one writer at a time. Rather than letting threadpool
+# requests race for the lock, every write goes through a pool holding a
+# single connection: requests queue for it in order and only the holder
+# ever takes the write lock. Other databases write through the main pool.
+if SQLITE_TUNED:
+    write_engine = build_engine(pool_size=1, max_overflow=0, pool_timeout=max(DB_POOL_TIMEOUT, 30))
+else:
+    write_engine = engine
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -28,11 +151,118 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+WriteSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=True,
+    bind=write_engine,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
+def tag(component):
+    """Session info that labels a session's queries with the component that issued them"""
+    return {"application_name": f"{DB_APPLICATION_NAME}:{component}"}
+
+@event.listens_for(Session, "after_begin")
+def set_application_name(session, transaction, connection):
+    # PostgreSQL shows application_name in pg_stat_activity and in the logs.
+    # It is set per connection and only re-issued when a connection moves
+    # to a session from a different component.
+    name = session.info.get("application_name")
+    if not name or connection.dialect.name != "postgresql":
+        return
+    if connection.info.get("application_name") != name:
+        connection.execute(text("SELECT set_config('application_name', :name, false)"), {"name": name})
+        connection.info["application_name"] = name
+
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(info=tag("backend"))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_write_db():
+    """Session for requests that modify data; on SQLite this waits for the single writer"""
+    db = WriteSessionLocal(info=tag("backend"))
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def async_database_url(url):
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)"""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    for prefix, async_prefix in (
+        ("sqlite://", "sqlite+aiosqlite://"),
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+def build_async_engine(**overrides):
+    # Imported here: sqlalchemy.ext.asyncio needs greenlet, which the sync
+    # deployment does not install.
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from pool_metrics import instrumented_async_queue_pool
+    if IS_POSTGRES:
+        server_settings = {"application_name": DB_APPLICATION_NAME}
+        if DB_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+        async_connect_args = {"server_settings": server_settings}
+    else:
+        async_connect_args = {}
+    engine = create_async_engine(
+        async_database_url(SQLALCHEMY_DATABASE_URL),
+        connect_args=async_connect_args,
+        poolclass=instrumented_async_queue_pool(),
+        **{**pool_args, **overrides}
+    )
+    return engine
+
+# The async engine is only built when DB_ASYNC is set, so the sync
+# deployment does not need aiosqlite or asyncpg installed.
+if DB_ASYNC and SQLITE_TUNED:
+    # The sync and async drivers cannot share a connection, so this would
+    # mean two single writers racing for SQLite's one write lock.
+    raise RuntimeError(
+        "DB_ASYNC cannot be combined with the SQLite profile's single writer; "
+        "use PostgreSQL or set SQLITE_PROFILE=0"
+    )
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    async_engine = async_write_engine = build_async_engine()
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        autoflush=True,
+        expire_on_commit=False
+    )
+    AsyncWriteSessionLocal = async_sessionmaker(
+        bind=async_write_engine,
+        autoflush=True,
+        expire_on_commit=False
+    )
+else:
+    async_engine = async_write_engine = None
+    AsyncSessionLocal = AsyncWriteSessionLocal = None
+
+async def get_async_db():
+    async with AsyncSessionLocal(info=tag("api-async")) as db:
+        yield db
+
+async def get_async_write_db():
+    async with AsyncWriteSessionLocal(info=tag("api-async")) as db:
+        yield db
+
+def pool_stats():
+    """Checkout counts, wait times and occupancy for every engine in use"""
+    engines = {"read": engine}
+    if write_engine is not engine:
+        engines["write"] = write_engine
+    if async_engine is not None:
+        engines["async_read"] = async_engine.sync_engine
+    return {name: pool_snapshot(e) for name, e in engines.items()}
\ No newline at end of file
@@ -0,0 +1,129 @@
+import hashlib
+import random
+from functools import lru_cache
+from itertools import chain
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import TableVersion
+from stats import COUNTER_SHARDS
+
+# Tables whose list and detail routes answer conditional GETs. Each has
+# COUNTER_SHARDS rows in table_versions; every committed write to the table
+# increments one of them, so the sum only ever grows and an ETag needs one
+# indexed read.
+VERSIONED_TABLES = ("customers", "cards", "trips", "cases", "tap_history", "fare_disputes")
+
+_PENDING_KEY = "pending_table_versions"
+
+
+@lru_cache(maxsize=None)
+def cascades(table: str) -> Tuple[str, ...]:
+    """Tables whose rows the database deletes or updates when a `table` row is deleted.
+
+    Follows ON DELETE CASCADE / SET NULL foreign keys transitively. The
+    session never sees those changes, so deletes mark these tables too.
+    """
+    found = []
+    pending = [table]
+    while pending:
+        parent = pending.pop()
+        for child in TableVersion.metadata.sorted_tables:
+            if child.name in found or child.name == table:
+                continue
+            if any(fk.column.table.name == parent and (fk.ondelete or "").upper() in ("CASCADE", "SET NULL")
+                   for fk in child.foreign_keys):
+                found.append(child.name)
+                pending.append(child.name)
+    return tuple(found)
+
+
+def mark_changed(db: Session, *tables: str) -> None:
+    """Bump the versions of `tables` when the session's transaction commits"""
+    db.info.setdefault(_PENDING_KEY, set()).update(t for t in tables if t in VERSIONED_TABLES)
+
+
+def ensure_versions(engine) -> None:
+    """Create any missing version rows up front, like ids.ensure_counters"""
+    with Session(engine) as db:
+        existing = set(db.execute(select(TableVersion.name, TableVersion.shard)).all())
+        for name in VERSIONED_TABLES:
+            missing = [shard for shard in range(COUNTER_SHARDS) if (name, shard) not in existing]
+            if not missing:
+                continue
+            try:
+                db.execute(insert(TableVersion), [{"name": name, "shard": shard, "version": 0} for shard in missing])
+                db.commit()
+            except IntegrityError:
+                # Another worker seeded it first.
+                db.rollback()
+
+
+def conditional_get(db: Session, request: Request, response: Response, *tables: str) -> Optional[Response]:
+    """Set a strong ETag for this URL and the current versions of `tables`.
+
+    Returns a 304 response when the client's If-None-Match already has it,
+    so the route can return before loading any rows. Returns None (and the
+    route carries on) otherwise, including when the versions are missing.
+    """
+    versions = dict(db.execute(
+        select(TableVersion.name, func.sum(TableVersion.version))
+        .where(TableVersion.name.in_(tables))
+        .group_by(TableVersion.name)
+    ).all())
+    if len(versions) != len(tables):
+        return None
+
+    url = request.url.path + "?" + request.url.query
+    state = ",".join(f"{name}={versions[name]}" for name in tables)
+    etag = '"' + hashlib.sha1(f"{url}|{state}".encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_orm_writes(session, flush_context):
+    for obj in chain(session.new, session.dirty):
+        mark_changed(session, obj.__table__.name)
+    for obj in session.deleted:
+        mark_changed(session, obj.__table__.name, *cascades(obj.__table__.name))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_writes(orm_execute_state):
+    # Core-style writes through Session.execute (ledger updates, bulk tap
+    # inserts, explicit deletes) never reach the flush.
+    if orm_execute_state.is_insert or orm_execute_state.is_update:
+        mark_changed(orm_execute_state.session, orm_execute_state.statement.table.name)
+    elif orm_execute_state.is_delete:
+        table = orm_execute_state.statement.table.name
+        mark_changed(orm_execute_state.session, table, *cascades(table))
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_versions(session):
+    # commit() only flushes after this hook, so flush here to see every write.
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    session.execute(
+        update(TableVersion)
+        .where(TableVersion.name.in_(sorted(pending)), TableVersion.shard == random.randrange(COUNTER_SHARDS))
+        .values(version=TableVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_versions(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,14 +1,48 @@
-from faker import Faker
+"""Synthetic data generator.
+
+    python generate_data.py                      # 50 customers, the demo dataset
+    python generate_data.py --scale 1000 --trips-per-card 20-60 --taps-per-customer 40-120 --workers 8
+
+--scale N creates 50*N customers with one card each. Every customer's rows
+come from their own RNG seeded from --seed and the customer number, so the
+output is identical for a given seed and --as-of no matter how many
+workers or what chunk size is used. Each worker in the process pool
+generates a chunk of customers and bulk-loads it itself, with COPY on
+PostgreSQL and batched multi-row INSERTs elsewhere, so rows never cross
+process boundaries. Secondary indexes are dropped for the load and
+rebuilt at the end.
+"""
+from faker.providers.person.en_US import Provider as PersonProvider
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from datetime import datetime, timedelta
+from functools import lru_cache
+import argparse
+import csv
+import io
+import math
+import os
 import random
-from database import SessionLocal, engine, Base
-from models import Customer, Card, Trip, Case, TapHistory
-import string
-
-fake = Faker(['en_US'])
+import re
+import time
+from sqlalchemy import insert
+from sqlalchemy.schema import DropIndex
+from database import WriteSessionLocal, engine, write_engine, Base, without_statement_timeout
+from models import Customer, Card, Trip, Case, TapHistory, IdCounter, CardLedger, FareDispute, TapArchive
+from ids import ensure_counters, reset_cache
+from migrations import ensure_indexes
+from partitions import ensure_partitions, partition_table
+from stats import reconcile
+from etags import VERSIONED_TABLES, ensure_versions, mark_changed
 
 CONFIG = {
-    'NUM_CUSTOMERS': 50
+    'CUSTOMERS_PER_SCALE': 50,
+    'TRIPS_PER_CARD': (2, 4),
+    'CASES_PER_CUSTOMER': (2, 4),
+    'TAPS_PER_CUSTOMER': (1, 3),
+    'CHUNK_SIZE': 1000,
+    'BATCH_SIZE': 10000,
+    'SEED': 42,
 }
 CARD_TYPES = ["Bank Card", "Account Based Card", "Closed Loop Card"]
 CARD_STATUSES = ["ACTIVE", "EXPIRED", "SUSPENDED", "BLOCKED"]
@@ -27,11 +61,23 @@ AGENTS = ["James Wilson", "Sarah Chen", "David Brown", "Emily Rodriguez"]
 DEVICE_TYPES = ["Reader", "Kiosk", "Gate", "Validator"]
 DIRECTIONS = ["Entry", "Exit"]
 TAP_RESULTS = ["Success", "Failure", "Timeout"]
+EMAIL_DOMAINS = ["example.com", "example.org", "example.net"]
 
-TAP_COUNTER = 1
+FIRST_NAMES = sorted(set(PersonProvider.first_names))
+LAST_NAMES = sorted(set(PersonProvider.last_names))
+
+# Load order; children after parents so foreign keys hold at every commit.
+TABLES = [
+    ("customers", Customer),
+    ("cards", Card),
+    ("trips", Trip),
+    ("cases", Case),
+    ("tap_history", TapHistory),
+]
+COLUMNS = {name: [column.name for column in model.__table__.columns] for name, model in TABLES}
 
 def get_db():
-    db = SessionLocal()
+    db = WriteSessionLocal()
     try:
         return db
     except Exception as e:
@@ -42,216 +88,302 @@ def clear_existing_data(db):
     """Clear all existing data from the tables"""
     print("Clearing existing data...")
     try:
+        db.query(FareDispute).delete()
+        db.query(CardLedger).delete()
         db.query(TapHistory).delete()
+        # Archive files stay on disk but are no longer listed or read.
+        db.query(TapArchive).delete()
         db.query(Case).delete()
         db.query(Trip).delete()
         db.query(Card).delete()
         db.query(Customer).delete()
+        db.query(IdCounter).delete()
         db.commit()
+        reset_cache()
         print("Successfully cleared all existing data.")
     except Exception as e:
         print(f"Error while clearing data: {e}")
         db.rollback()
         raise
 
-def create_customers(count):
-    customers = []
-    used_names = set()
-    used_emails = set()
-    
-    for i in range(count):
-        while True:
-            name = fake.name()
-            if name not in used_names:
-                used_names.add(name)
-                break
-        
-        while True:
-            email = fake.email()
-            if email not in used_emails:
-                used_emails.add(email)
-                break
-        
-        customer = Customer(
-            id=f"CUST{str(i+1).zfill(6)}",
-            name=name,
-            email=email,
-            phone=fake.phone_number(),
-            notifications="Email Enabled",
-            join_date=datetime.now() - timedelta(days=random.randint(0, 365))
-        )
-        customers.append(customer)
-    return customers
-
-def create_cards(customers):
-    """Create one card for each customer"""
-    cards = []
-    for i, customer in enumerate(customers):
-        card = Card(
-            id=f"4716{str(i+1).zfill(12)}",
-            type=random.choice(CARD_TYPES),
-            status=random.choice(CARD_STATUSES),
-            balance=round(random.uniform(20, 200), 2),
-            customer_id=customer.id,
-            issue_date=datetime.now() - timedelta(days=random.randint(0, 180))
-        )
-        cards.append(card)
-    return cards
-
-def create_trips(customers, cards):
-    """Create 2-4 trips for each card"""
-    trips = []
-    trip_counter = 1
-    print(f"Creating trips for {len(cards)} cards...")
-    for i, card in enumerate(cards):
-        num_trips = random.randint(2, 4)
-        print(f"Card {i+1}/{len(cards)}: {card.id}: {num_trips} trips")
-        for _ in range(num_trips):
-            start_time = datetime.now() - timedelta(days=random.randint(1, 30), hours=random.randint(1, 23))
-            end_time = start_time + timedelta(minutes=random.randint(15, 120))
-            entry_loc = random.choice(STATIONS)
-            exit_loc = random.choice([s for s in STATIONS if s != entry_loc])
-            trip = Trip(
-                id=f"T{str(trip_counter).zfill(6)}",
-                card_id=card.id,
-                start_time=start_time,
-                end_time=end_time,
-                entry_location=entry_loc,
-                exit_location=exit_loc,
-                fare=round(random.uniform(2, 25), 2),
-                route=random.choice(ROUTES),
-                operator=random.choice(OPERATORS),
-                transit_mode=random.choice(TRANSIT_MODES),
-                adjustable=random.choice(["Yes", "No"])
-            )
-            trips.append(trip)
-            trip_counter += 1
-    print(f"Total trips created: {len(trips)}")
-    return trips
-
-def create_cases(customers, cards):
-    """Create 2-4 cases for each customer (using their card)"""
-    cases = []
-    case_counter = 1
-    for customer in customers:
-        card = next(card for card in cards if card.customer_id == customer.id)
-        num_cases = random.randint(2, 4)
-        for _ in range(num_cases):
-            category = random.choice(CASE_CATEGORIES)
-            created_date = datetime.now() - timedelta(days=random.randint(1, 30))
-            case = Case(
-                id=f"CS{str(case_counter).zfill(6)}",
-                created_date=created_date,
-                last_updated=created_date + timedelta(hours=random.randint(1, 48)),
-                customer_id=customer.id,
-                card_id=card.id,
-                case_status=random.choice(CASE_STATUSES),
-                priority=random.choice(CASE_PRIORITIES),
-                category=category,
-                assigned_agent=random.choice(AGENTS),
-                notes=f"Sample case for {category}"
+@lru_cache(maxsize=None)
+def name_permutation(seed):
+    space = len(FIRST_NAMES) * len(LAST_NAMES)
+    rng = random.Random(seed)
+    step = rng.randrange(1, space)
+    while math.gcd(step, space) != 1:
+        step += 1
+    return space, step, rng.randrange(space)
+
+def customer_name(index, seed):
+    """Unique full name for customer `index`.
+
+    Walks the first x last name grid through an affine permutation, so
+    every index below len(FIRST_NAMES) * len(LAST_NAMES) gets a distinct
+    pair without keeping a set of names already used.
+    """
+    space, step, offset = name_permutation(seed)
+    position = (step * index + offset) % space
+    first = FIRST_NAMES[position % len(FIRST_NAMES)]
+    last = LAST_NAMES[position // len(FIRST_NAMES)]
+    if index >= space:
+        # Past the grid: disambiguate with a suffix.
+        return first, last, f"{first} {last} {index // space + 1}"
+    return first, last, f"{first} {last}"
+
+def generate_chunk(spec):
+    """Build all rows for customers [start, stop) as tuples in COLUMNS order"""
+    start, stop, seed, as_of, trips_per_card, cases_per_customer, taps_per_customer = spec
+    rows = {name: [] for name, _ in TABLES}
+    max_trips, max_cases, max_taps = trips_per_card[1], cases_per_customer[1], taps_per_customer[1]
+
+    for i in range(start, stop):
+        rng = random.Random(seed * 1000003 + i)
+        customer_id = f"CUST{str(i+1).zfill(6)}"
+        card_id = f"4716{str(i+1).zfill(12)}"
+        first, last, name = customer_name(i, seed)
+        rows["customers"].append((
+            customer_id,
+            name,
+            re.sub(r"[^a-z0-9.]", "", f"{first}.{last}{i+1}".lower()) + f"@{rng.choice(EMAIL_DOMAINS)}",
+            f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+            "Email Enabled",
+            as_of - timedelta(days=rng.randint(0, 365)),
+        ))
+        rows["cards"].append((
+            card_id,
+            rng.choice(CARD_TYPES),
+            rng.choice(CARD_STATUSES),
+            round(rng.uniform(20, 200), 2),
+            None,
+            as_of - timedelta(days=rng.randint(0, 180)),
+            customer_id,
+        ))
+
+        # IDs are numbered by slot (customer number x per-customer maximum),
+        # so chunks never need to coordinate; unused slots leave gaps.
+        customer_trips = []
+        for j in range(rng.randint(*trips_per_card)):
+            start_time = as_of - timedelta(days=rng.randint(1, 30), hours=rng.randint(1, 23), minutes=rng.randint(0, 59))
+            entry_loc = rng.choice(STATIONS)
+            exit_loc = rng.choice([s for s in STATIONS if s != entry_loc])
+            trip = (
+                f"T{str(i * max_trips + j + 1).zfill(6)}",
+                start_time,
+                start_time + timedelta(minutes=rng.randint(15, 120)),
+                entry_loc,
+                exit_loc,
+                round(rng.uniform(2, 25), 2),
+                rng.choice(ROUTES),
+                rng.choice(OPERATORS),
+                rng.choice(TRANSIT_MODES),
+                rng.choice(["Yes", "No"]),
+                card_id,
             )
-            cases.append(case)
-            case_counter += 1
-    return cases
-
-def create_tap_history(customers, cards, trips):
-    """Create 1-3 tap history entries for each customer (using their card and random trip info)"""
-    tap_history = []
-    tap_counter = 1
-    for customer in customers:
-        card = next(card for card in cards if card.customer_id == customer.id)
-        customer_trips = [trip for trip in trips if trip.card_id == card.id]
-        num_taps = random.randint(1, 3)
-        for _ in range(num_taps):
+            customer_trips.append(trip)
+        rows["trips"].extend(customer_trips)
+
+        for j in range(rng.randint(*cases_per_customer)):
+            category = rng.choice(CASE_CATEGORIES)
+            created_date = as_of - timedelta(days=rng.randint(1, 30))
+            rows["cases"].append((
+                f"CS{str(i * max_cases + j + 1).zfill(6)}",
+                created_date,
+                created_date + timedelta(hours=rng.randint(1, 48)),
+                customer_id,
+                card_id,
+                rng.choice(CASE_STATUSES),
+                rng.choice(CASE_PRIORITIES),
+                category,
+                rng.choice(AGENTS),
+                f"Sample case for {category}",
+            ))
+
+        for j in range(rng.randint(*taps_per_customer)):
             if customer_trips:
-                trip = random.choice(customer_trips)
-                tap_time = trip.start_time + timedelta(minutes=random.randint(0, 30))
-                location = random.choice([trip.entry_location, trip.exit_location])
-                transit_mode = trip.transit_mode
+                trip = rng.choice(customer_trips)
+                tap_time = trip[1] + timedelta(minutes=rng.randint(0, 30))
+                location = rng.choice([trip[3], trip[4]])
+                transit_mode = trip[8]
             else:
-                tap_time = datetime.now() - timedelta(days=random.randint(1, 30), hours=random.randint(1, 23), minutes=random.randint(0, 59))
-                location = random.choice(STATIONS)
-                transit_mode = random.choice(TRANSIT_MODES)
-            device_type = random.choice(DEVICE_TYPES)
-            device_number = random.randint(100, 999)
-            tap = TapHistory(
-                id=f"TH{str(tap_counter).zfill(6)}",
-                tap_time=tap_time,
-                location=location,
-                device_id=f"{device_type} {device_number}",
-                transit_mode=transit_mode,
-                direction=random.choice(DIRECTIONS),
-                customer_id=customer.id,
-                result=random.choice(TAP_RESULTS)
-            )
-            tap_history.append(tap)
-            tap_counter += 1
-    return tap_history
+                tap_time = as_of - timedelta(days=rng.randint(1, 30), hours=rng.randint(1, 23), minutes=rng.randint(0, 59))
+                location = rng.choice(STATIONS)
+                transit_mode = rng.choice(TRANSIT_MODES)
+            rows["tap_history"].append((
+                f"TH{str(i * max_taps + j + 1).zfill(6)}",
+                tap_time,
+                location,
+                f"{rng.choice(DEVICE_TYPES)} {rng.randint(100, 999)}",
+                transit_mode,
+                rng.choice(DIRECTIONS),
+                customer_id,
+                rng.choice(TAP_RESULTS),
+            ))
+    return rows
+
+def column_order_check():
+    # generate_chunk builds positional tuples; fail loudly if a model changes.
+    expected = {
+        "customers": ["id", "name", "email", "phone", "notifications", "join_date"],
+        "cards": ["id", "type", "status", "balance", "product", "issue_date", "customer_id"],
+        "trips": ["id", "start_time", "end_time", "entry_location", "exit_location", "fare",
+                  "route", "operator", "transit_mode", "adjustable", "card_id"],
+        "cases": ["id", "created_date", "last_updated", "customer_id", "card_id", "case_status",
+                  "priority", "category", "assigned_agent", "notes"],
+        "tap_history": ["id", "tap_time", "location", "device_id", "transit_mode", "direction",
+                        "customer_id", "result"],
+    }
+    if COLUMNS != expected:
+        raise RuntimeError("generate_data column layout no longer matches models.py")
+
+def copy_rows(conn, table, rows):
+    """Load with COPY when the driver supports it (psycopg2); returns False otherwise"""
+    cursor = conn.connection.cursor()
+    if not hasattr(cursor, "copy_expert"):
+        return False
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        ["" if value is None else value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return True
+
+IN_WORKER = False
+
+def init_worker():
+    # Forked workers must not reuse the parent's pooled connections.
+    global IN_WORKER
+    IN_WORKER = True
+    write_engine.dispose(close=False)
 
-def print_statistics(customers, cards, trips, cases, tap_history):
+def load_chunk(rows, batch_size):
+    with write_engine.begin() as conn:
+        if IN_WORKER and conn.dialect.name == "sqlite":
+            # Workers take turns on SQLite's single write lock; wait for it
+            # rather than failing while another worker commits its chunk.
+            conn.exec_driver_sql("PRAGMA busy_timeout = 600000")
+        use_copy = conn.dialect.name == "postgresql"
+        for table, model in TABLES:
+            table_rows = rows[table]
+            if not table_rows:
+                continue
+            if use_copy and copy_rows(conn, table, table_rows):
+                continue
+            keys = COLUMNS[table]
+            for lo in range(0, len(table_rows), batch_size):
+                conn.execute(insert(model), [dict(zip(keys, row)) for row in table_rows[lo:lo + batch_size]])
+
+def build_chunk(spec, batch_size):
+    """Generate and load one chunk inside the worker; only row counts travel back"""
+    rows = generate_chunk(spec)
+    load_chunk(rows, batch_size)
+    return {table: len(table_rows) for table, table_rows in rows.items()}
+
+def drop_secondary_indexes():
+    with write_engine.begin() as conn:
+        for _, model in TABLES:
+            for index in model.__table__.indexes:
+                conn.execute(DropIndex(index, if_exists=True))
+
+def run_chunks(specs, workers, batch_size):
+    """Yield per-chunk row counts, keeping at most 2*workers chunks in flight"""
+    if workers <= 1 or len(specs) <= 1:
+        for spec in specs:
+            yield build_chunk(spec, batch_size)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        pending = deque()
+        specs = iter(specs)
+        for spec in specs:
+            pending.append(pool.submit(build_chunk, spec, batch_size))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            counts = pending.popleft().result()
+            spec = next(specs, None)
+            if spec is not None:
+                pending.append(pool.submit(build_chunk, spec, batch_size))
+            yield counts
+
+def print_statistics(totals, num_customers):
     """Print generation statistics"""
     print("\n=== Data Generation Statistics ===")
-    print(f"Total Customers: {len(customers)}")
-    print(f"Total Cards: {len(cards)}")
-    print(f"Total Trips: {len(trips)}")
-    print(f"Total Cases: {len(cases)}")
-    print(f"Total Tap History Entries: {len(tap_history)}")
-    print(f"Average Trips per Card: {len(trips)/len(cards):.1f}")
-    print(f"Average Cases per Customer: {len(cases)/len(customers):.1f}")
-    print(f"Average Tap History Entries per Customer: {len(tap_history)/len(customers):.1f}")
-    
-    card_to_customer = {card.id: card.customer_id for card in cards}
-    customers_with_trips = len(set(card_to_customer.get(trip.card_id) for trip in trips if trip.card_id in card_to_customer))
-    customers_with_cases = len(set(case.customer_id for case in cases))
-    customers_with_tap_history = len(set(tap.customer_id for tap in tap_history))
-    
-    print(f"\n=== Coverage Statistics ===")
-    print(f"Customers with Trips: {customers_with_trips}/{len(customers)} ({customers_with_trips/len(customers)*100:.1f}%)")
-    print(f"Customers with Cases: {customers_with_cases}/{len(customers)} ({customers_with_cases/len(customers)*100:.1f}%)")
-    print(f"Customers with Tap History: {customers_with_tap_history}/{len(customers)} ({customers_with_tap_history/len(customers)*100:.1f}%)")
-    
-    if customers_with_trips == len(customers) and customers_with_cases == len(customers) and customers_with_tap_history == len(customers):
-        print("\n✅ SUCCESS: All customers have trips, cases, and tap history!")
-    else:
-        print("\n⚠️  WARNING: Some customers are missing data!")
-
-def main():
+    print(f"Total Customers: {totals['customers']}")
+    print(f"Total Cards: {totals['cards']}")
+    print(f"Total Trips: {totals['trips']}")
+    print(f"Total Cases: {totals['cases']}")
+    print(f"Total Tap History Entries: {totals['tap_history']}")
+    print(f"Average Trips per Card: {totals['trips']/max(totals['cards'], 1):.1f}")
+    print(f"Average Cases per Customer: {totals['cases']/max(num_customers, 1):.1f}")
+    print(f"Average Tap History Entries per Customer: {totals['tap_history']/max(num_customers, 1):.1f}")
+
+def parse_range(value):
+    low, _, high = value.partition("-")
+    low, high = int(low), int(high or low)
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"invalid range '{value}'")
+    return low, high
+
+def main(
+    scale=1,
+    seed=CONFIG['SEED'],
+    workers=1,
+    as_of=None,
+    trips_per_card=CONFIG['TRIPS_PER_CARD'],
+    cases_per_customer=CONFIG['CASES_PER_CUSTOMER'],
+    taps_per_customer=CONFIG['TAPS_PER_CUSTOMER'],
+    chunk_size=CONFIG['CHUNK_SIZE'],
+    batch_size=CONFIG['BATCH_SIZE'],
+):
     print("\nStarting data generation process...")
+    column_order_check()
+    num_customers = int(CONFIG['CUSTOMERS_PER_SCALE'] * scale)
+    as_of = as_of or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     db = get_db()
-    
+
     try:
         Base.metadata.create_all(bind=engine)
-        
+
         clear_existing_data(db)
-        
-        print(f"\nGenerating {CONFIG['NUM_CUSTOMERS']} customers...")
-        customers = create_customers(CONFIG['NUM_CUSTOMERS'])
-        db.add_all(customers)
-        db.commit()
-        
-        print("Generating cards...")
-        cards = create_cards(customers)
-        db.add_all(cards)
-        db.commit()
-        
-        print("Generating trips...")
-        trips = create_trips(customers, cards)
-        db.add_all(trips)
-        db.commit()
-        
-        print("Generating cases...")
-        cases = create_cases(customers, cards)
-        db.add_all(cases)
-        db.commit()
-        
-        print("Generating tap history...")
-        tap_history = create_tap_history(customers, cards, trips)
-        db.add_all(tap_history)
-        db.commit()
-        
-        print_statistics(customers, cards, trips, cases, tap_history)
-        
+        with write_engine.begin() as conn:
+            # tap_history was just emptied, so partitioning it here is cheap.
+            partition_table(conn)
+            # Taps go back up to 30 days before --as-of.
+            ensure_partitions(conn, as_of - timedelta(days=31), as_of)
+        drop_secondary_indexes()
+
+        print(f"\nGenerating {num_customers} customers with {workers} worker(s), seed {seed}...")
+        specs = [
+            (start, min(start + chunk_size, num_customers), seed, as_of,
+             trips_per_card, cases_per_customer, taps_per_customer)
+            for start in range(0, num_customers, chunk_size)
+        ]
+        totals = {table: 0 for table, _ in TABLES}
+        started = time.perf_counter()
+        report_every = max(1, len(specs) // 20)
+        for n, counts in enumerate(run_chunks(specs, workers, batch_size), 1):
+            for table in totals:
+                totals[table] += counts[table]
+            if n % report_every == 0 or n == len(specs):
+                loaded = sum(totals.values())
+                elapsed = time.perf_counter() - started
+                print(f"  {n}/{len(specs)} chunks, {loaded} rows, {loaded / max(elapsed, 1e-9):.0f} rows/s")
+
+        print("Rebuilding indexes...")
+        with write_engine.begin() as conn:
+            without_statement_timeout(conn)
+            ensure_indexes(conn)
+
+        ensure_counters(engine)
+        ensure_versions(engine)
+        # The workers loaded through their own connections; invalidate every ETag.
+        mark_changed(db, *VERSIONED_TABLES)
+        reconcile(db)
+
+        print_statistics(totals, num_customers)
+
     except Exception as e:
         print(f"Error generating data: {e}")
         db.rollback()
@@ -260,4 +392,16 @@ def main():
         print("\nData generation completed!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic CRM data")
+    parser.add_argument("--scale", type=float, default=1, help=f"{CONFIG['CUSTOMERS_PER_SCALE']} customers per unit")
+    parser.add_argument("--seed", type=int, default=CONFIG['SEED'])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="anchor date for generated timestamps (default: today)")
+    parser.add_argument("--trips-per-card", type=parse_range, default=CONFIG['TRIPS_PER_CARD'], help="e.g. 2-4")
+    parser.add_argument("--cases-per-customer", type=parse_range, default=CONFIG['CASES_PER_CUSTOMER'])
+    parser.add_argument("--taps-per-customer", type=parse_range, default=CONFIG['TAPS_PER_CUSTOMER'])
+    parser.add_argument("--chunk-size", type=int, default=CONFIG['CHUNK_SIZE'], help="customers per worker task")
+    parser.add_argument("--batch-size", type=int, default=CONFIG['BATCH_SIZE'], help="rows per INSERT batch")
+    args = parser.parse_args()
+    main(**vars(args))
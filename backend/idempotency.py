@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from cache import MemoryCache
+from models import IdempotencyKey
+
+# Successful POS/CRM mutations are recorded under their Idempotency-Key
+# (or robotRunId) for IDEMPOTENCY_TTL seconds; a retry gets the original
+# response back instead of applying the change again. The most recent
+# IDEMPOTENCY_CACHE_SIZE responses are also kept in memory, so a retry
+# storm is answered without a database round trip.
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# Expired keys are deleted on every Nth claim in each process.
+IDEMPOTENCY_PURGE_EVERY = int(os.getenv("IDEMPOTENCY_PURGE_EVERY", "500"))
+
+_PENDING_KEY = "pending_idempotent_responses"
+
+replays = MemoryCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL)
+_claims = 0
+_claims_lock = threading.Lock()
+
+
+def scoped_key(header: Optional[str], fallback: Optional[str], *scope: str) -> Optional[str]:
+    """Namespaced store key for a request, or None when it carries no key"""
+    key = header or fallback
+    if not key:
+        return None
+    return ":".join((*scope, key))
+
+
+def _stored(db: Session, key: str) -> Optional[dict]:
+    cutoff = datetime.now() - timedelta(seconds=IDEMPOTENCY_TTL)
+    raw = db.execute(
+        select(IdempotencyKey.response).where(IdempotencyKey.key == key, IdempotencyKey.created_at >= cutoff)
+    ).scalar()
+    return json.loads(raw) if raw else None
+
+
+def _purge_due() -> bool:
+    global _claims
+    with _claims_lock:
+        _claims += 1
+        return _claims % IDEMPOTENCY_PURGE_EVERY == 0
+
+
+def claim_or_replay(db: Session, key: Optional[str]) -> Optional[dict]:
+    """Return the stored response for `key`, or claim the key and return None.
+
+    Must run before the route writes anything: the claim is an INSERT in
+    the route's transaction, so a concurrent request with the same key
+    waits on it (or fails on SQLite's single writer) and then replays the
+    committed response. If the other request has not committed a response
+    yet, this one fails with 409 rather than running unclaimed. A route
+    that ends without committing leaves the key free for the next retry.
+    """
+    if key is None:
+        return None
+    stored = replays.get_or_load(key, lambda: _stored(db, key))
+    if stored is not None:
+        return stored
+
+    cutoff = datetime.now() - timedelta(seconds=IDEMPOTENCY_TTL)
+    if _purge_due():
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+    else:
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.created_at < cutoff))
+    try:
+        db.execute(insert(IdempotencyKey).values(key=key, created_at=datetime.now()))
+    except IntegrityError:
+        # Another request with this key claimed it first.
+        db.rollback()
+        stored = _stored(db, key)
+        db.rollback()
+        if stored is None:
+            # Still in flight, or it just rolled back; the client retries.
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this idempotency key is in progress",
+                headers={"Retry-After": "1"}
+            )
+        replays.put(key, stored)
+        return stored
+    return None
+
+
+def remember(db: Session, key: Optional[str], response: BaseModel) -> None:
+    """Record the response for a claimed key; it becomes visible on commit"""
+    if key is None:
+        return
+    content = response.model_dump(mode="json")
+    db.execute(update(IdempotencyKey).where(IdempotencyKey.key == key).values(response=json.dumps(content)))
+    db.info.setdefault(_PENDING_KEY, {})[key] = content
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_responses(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    for key, content in (pending or {}).items():
+        replays.put(key, content)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_responses(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+from typing import Dict, List
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Customer, Trip, Case, TapHistory, User, IdCounter
+
+# Sequences with a block size of 1 reserve their value inside the caller's
+# transaction, so a rollback hands the number back and the series stays
+# gap-free. Larger blocks are cached in-process once the reserving
+# transaction commits; a crash or an unused remainder leaves a gap.
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "100"))
+
+_PENDING_KEY = "pending_id_blocks"
+
+
+class IdSequence:
+    def __init__(self, name, model, prefix, width, block_size=1):
+        self.name = name
+        self.model = model
+        self.prefix = prefix
+        self.width = width
+        self.block_size = max(1, block_size)
+
+    def format(self, value: int) -> str:
+        return f"{self.prefix}{str(value).zfill(self.width)}"
+
+
+SEQUENCES = {
+    "customer": IdSequence("customer", Customer, "C", 3),
+    "trip": IdSequence("trip", Trip, "T", 3, block_size=ID_BLOCK_SIZE),
+    "case": IdSequence("case", Case, "CS", 3),
+    "tap_history": IdSequence("tap_history", TapHistory, "TH", 6, block_size=ID_BLOCK_SIZE),
+    "user": IdSequence("user", User, "U", 3),
+}
+
+_lock = threading.Lock()
+_free_blocks: Dict[str, List[List[int]]] = {name: [] for name in SEQUENCES}
+
+
+def _take(blocks: List[List[int]], count: int) -> List[int]:
+    """Pop up to `count` values off the front of a list of [start, end) ranges."""
+    values = []
+    while blocks and len(values) < count:
+        start, end = blocks[0]
+        n = min(end - start, count - len(values))
+        values.extend(range(start, start + n))
+        if start + n >= end:
+            blocks.pop(0)
+        else:
+            blocks[0][0] = start + n
+    return values
+
+
+def _legacy_high_water(db: Session, seq: IdSequence) -> int:
+    """Highest number already used by the table, counting the old len()+1 scheme."""
+    highest = db.query(func.count(seq.model.id)).scalar() or 0
+    pattern = re.compile(rf"^{re.escape(seq.prefix)}(\d+)$")
+    ids = db.execute(
+        select(seq.model.id)
+        .where(seq.model.id.like(f"{seq.prefix}%"))
+        .execution_options(yield_per=10000)
+    ).scalars()
+    for value in ids:
+        match = pattern.match(value)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def _seed(db: Session, seq: IdSequence) -> None:
+    db.execute(
+        insert(IdCounter).values(name=seq.name, next_value=_legacy_high_water(db, seq) + 1)
+    )
+
+
+def _reserve(db: Session, seq: IdSequence, size: int) -> int:
+    """Advance the counter row by `size` in the caller's transaction and return the first value."""
+    stmt = (
+        update(IdCounter)
+        .where(IdCounter.name == seq.name)
+        .values(next_value=IdCounter.next_value + size)
+        .returning(IdCounter.next_value)
+        .execution_options(synchronize_session=False)
+    )
+    end = db.execute(stmt).scalar()
+    if end is None:
+        _seed(db, seq)
+        end = db.execute(stmt).scalar()
+    return end - size
+
+
+def next_ids(db: Session, name: str, count: int) -> List[str]:
+    """Allocate `count` formatted IDs for the named sequence.
+
+    Counter updates run on the caller's session, so the reservation commits
+    or rolls back together with the rows that use the IDs.
+    """
+    seq = SEQUENCES[name]
+    if count <= 0:
+        return []
+
+    pending = db.info.setdefault(_PENDING_KEY, {}).setdefault(name, [])
+    values = _take(pending, count)
+
+    if len(values) < count and seq.block_size > 1:
+        with _lock:
+            values.extend(_take(_free_blocks[name], count - len(values)))
+
+    missing = count - len(values)
+    if missing:
+        size = max(missing, seq.block_size)
+        start = _reserve(db, seq, size)
+        values.extend(range(start, start + missing))
+        if size > missing:
+            pending.append([start + missing, start + size])
+
+    return [seq.format(value) for value in values]
+
+
+def next_id(db: Session, name: str) -> str:
+    return next_ids(db, name, 1)[0]
+
+
+def ensure_counters(engine) -> None:
+    """Create any missing counter rows up front so requests never pay for seeding."""
+    with Session(engine) as db:
+        existing = set(db.execute(select(IdCounter.name)).scalars())
+        for seq in SEQUENCES.values():
+            if seq.name in existing:
+                continue
+            try:
+                _seed(db, seq)
+                db.commit()
+            except IntegrityError:
+                # Another worker seeded it first.
+                db.rollback()
+
+
+def reset_cache() -> None:
+    with _lock:
+        for blocks in _free_blocks.values():
+            blocks.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_blocks(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    with _lock:
+        for name, blocks in pending.items():
+            _free_blocks[name].extend(blocks)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_blocks(session):
+    # The counter update was rolled back with the transaction, so the
+    # remainder of the block is handed back to the database rather than kept.
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,275 @@
+"""Bulk customer and card import from CSV or NDJSON.
+
+Input is read and loaded a chunk of IMPORT_CHUNK_SIZE records at a time,
+so memory stays flat however large the file is. Every record is checked
+against the same CustomerCreate / CardCreate rules as the single-row
+routes; duplicates are found with one IN query per column per chunk
+(against the table and within the chunk), and the rows that pass go in
+with COPY on PostgreSQL or multi-row INSERTs elsewhere. Each chunk
+commits on its own: a bad record is reported and skipped, never the
+whole import. Customer IDs are assigned by the server, so the report lists
+the ID each imported customer line received, up to IMPORT_MAX_IDS of them;
+callers that need them all take each chunk's IDs through on_ids.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from api import CardCreate, CustomerCreate, lookup_by_id
+from cache import customer_cards_key, invalidate
+from etags import mark_changed
+from ids import next_ids
+from models import Card, Customer
+from stats import bump
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Rejected records beyond this many are counted but not listed in the report.
+IMPORT_MAX_REJECTS = int(os.getenv("IMPORT_MAX_REJECTS", "1000"))
+# Likewise for the server-assigned IDs the report lists by input line; pass
+# on_ids to import_records (import_data.py --ids-out) for the full mapping.
+IMPORT_MAX_IDS = int(os.getenv("IMPORT_MAX_IDS", "1000"))
+
+FORMATS = ("csv", "ndjson")
+
+# (line, record, parse error)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+class ImportReport:
+    def __init__(self, table: str, max_rejects: int = IMPORT_MAX_REJECTS, max_ids: int = IMPORT_MAX_IDS):
+        self.table = table
+        self.max_rejects = max_rejects
+        self.max_ids = max_ids
+        self.processed = 0
+        self.imported = 0
+        self.rejected = 0
+        self.chunks = 0
+        self.rejects: List[dict] = []
+        # Server-assigned IDs of the imported records, by input line.
+        self.assigned = 0
+        self.ids: List[dict] = []
+
+    def reject(self, line: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({"line": line, "error": reason})
+
+    def assign(self, line: int, id_: str) -> None:
+        self.assigned += 1
+        if len(self.ids) < self.max_ids:
+            self.ids.append({"line": line, "id": id_})
+
+    def snapshot(self) -> dict:
+        return {
+            "table": self.table,
+            "processed": self.processed,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "chunks": self.chunks,
+            "rejects": self.rejects,
+            "rejects_truncated": self.rejected > len(self.rejects),
+            "ids": self.ids,
+            "ids_truncated": self.assigned > len(self.ids),
+        }
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Record]:
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # Empty cells count as missing, so optional columns fall back to
+        # their defaults and required ones are reported as missing.
+        yield reader.line_num, {k: v for k, v in row.items() if k is not None and v != ""}, None
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Record]:
+    for line_num, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_num, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_num, None, "expected a JSON object"
+            continue
+        yield line_num, record, None
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def _errors(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'record'}: {error['msg']}" for error in e.errors()
+    )
+
+
+def _validate(chunk: List[Record], schema, report: ImportReport) -> List[Tuple[int, object]]:
+    valid = []
+    for line, record, error in chunk:
+        if error is not None:
+            report.reject(line, error)
+            continue
+        try:
+            valid.append((line, schema.model_validate(record)))
+        except ValidationError as e:
+            report.reject(line, _errors(e))
+    return valid
+
+
+def _customer_rows(db: Session, chunk: List[Record], report: ImportReport) -> List[Tuple[int, dict]]:
+    valid = _validate(chunk, CustomerCreate, report)
+    taken_emails = set(lookup_by_id(db, (c.email for _, c in valid), Customer.email))
+    taken_names = set(lookup_by_id(db, (c.name for _, c in valid), Customer.name))
+
+    accepted = []
+    for line, customer in valid:
+        if customer.email in taken_emails:
+            report.reject(line, f"Customer with email '{customer.email}' already exists")
+        elif customer.name in taken_names:
+            report.reject(line, f"Customer with name '{customer.name}' already exists")
+        else:
+            # Later records in the chunk clash with this one.
+            taken_emails.add(customer.email)
+            taken_names.add(customer.name)
+            accepted.append((line, customer))
+
+    now = datetime.now()
+    ids = next_ids(db, "customer", len(accepted))
+    rows = [
+        (line, {"id": id_, **customer.model_dump(), "join_date": now})
+        for id_, (line, customer) in zip(ids, accepted)
+    ]
+    if rows:
+        bump(db, total_customers=len(rows))
+    return rows
+
+
+def _card_rows(db: Session, chunk: List[Record], report: ImportReport) -> List[Tuple[int, dict]]:
+    valid = _validate(chunk, CardCreate, report)
+    taken = set(lookup_by_id(db, (c.id for _, c in valid), Card.id))
+    customers = set(lookup_by_id(db, (c.customer_id for _, c in valid), Customer.id))
+
+    accepted = []
+    for line, card in valid:
+        if card.id in taken:
+            report.reject(line, f"Card with ID '{card.id}' already exists")
+        elif card.customer_id not in customers:
+            report.reject(line, f"Customer with ID '{card.customer_id}' not found")
+        else:
+            taken.add(card.id)
+            accepted.append((line, card))
+
+    now = datetime.now()
+    rows = [(line, {**card.model_dump(), "issue_date": card.issue_date or now}) for line, card in accepted]
+    if rows:
+        bump(db, total_cards=len(rows), total_balance=sum(row["balance"] for _, row in rows))
+        # New cards change their customers' card lists.
+        invalidate(db, *{customer_cards_key(row["customer_id"]) for _, row in rows})
+    return rows
+
+
+# Table name -> (model, builds the (line, row) pairs to insert for one
+# chunk, whether the rows get server-assigned IDs)
+IMPORTS: Dict[str, Tuple[type, Callable, bool]] = {
+    "customers": (Customer, _customer_rows, True),
+    "cards": (Card, _card_rows, False),
+}
+
+
+def _copy(db: Session, model, rows: List[dict]) -> bool:
+    """Load with COPY when the driver supports it (psycopg2); returns False otherwise"""
+    cursor = db.connection().connection.cursor()
+    if not hasattr(cursor, "copy_expert"):
+        return False
+    columns = [column.name for column in model.__table__.columns]
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        ["" if row.get(c) is None else row[c].isoformat() if isinstance(row[c], datetime) else row[c] for c in columns]
+        for row in rows
+    )
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return True
+
+
+def _load(db: Session, model, rows: List[dict]) -> None:
+    if db.get_bind().dialect.name == "postgresql" and _copy(db, model, rows):
+        mark_changed(db, model.__tablename__)
+        return
+    db.execute(insert(model), rows)
+
+
+def import_records(
+    db: Session,
+    table: str,
+    records: Iterable[Record],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+    on_ids: Optional[Callable[[List[Tuple[int, str]]], None]] = None,
+) -> ImportReport:
+    """Validate and load `records` into `table`, committing chunk by chunk.
+
+    `on_ids` receives the (line, ID) pairs of each committed chunk whose
+    IDs the server assigned.
+    """
+    model, build_rows, assigns_ids = IMPORTS[table]
+    report = ImportReport(table)
+    # COPY goes through the raw DBAPI cursor, so its errors are not wrapped.
+    conflicts = (IntegrityError, getattr(db.get_bind().dialect.dbapi, "IntegrityError", IntegrityError))
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        report.processed += len(chunk)
+        report.chunks += 1
+        checkpoint = (report.rejected, len(report.rejects))
+        try:
+            rows = build_rows(db, chunk, report)
+            if rows:
+                _load(db, model, [row for _, row in rows])
+            db.commit()
+            report.imported += len(rows)
+            if assigns_ids:
+                assigned = [(line, row["id"]) for line, row in rows]
+                for line, id_ in assigned:
+                    report.assign(line, id_)
+                if on_ids is not None and assigned:
+                    on_ids(assigned)
+        except conflicts as e:
+            # A concurrent writer took an ID, name or email between the
+            # duplicate check and the insert. Report the chunk and go on.
+            db.rollback()
+            report.rejected, rejects = checkpoint
+            del report.rejects[rejects:]
+            reason = f"chunk not imported, conflicting write: {getattr(e, 'orig', e)}"
+            for line, _, _ in chunk:
+                report.reject(line, reason)
+        if progress is not None:
+            progress(report)
+    return report
+
+
+def import_file(db: Session, table: str, stream, format: str, **kwargs) -> ImportReport:
+    """Import from a text stream of CSV (with a header row) or NDJSON"""
+    return import_records(db, table, READERS[format](stream), **kwargs)
+
+
+def guess_format(filename: str) -> Optional[str]:
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
@@ -1,11 +1,13 @@
 from database import engine
 from models import Base
+from migrations import run_migrations
 
 def init_db():
     print("Dropping all existing tables to fix schema...")
     Base.metadata.drop_all(bind=engine)
     print("Creating database tables with correct schema...")
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     print("Database tables recreated with correct schema!")
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from cache import invalidate_card
+from models import Card, CardLedger
+from stats import bump
+
+cards_table = Card.__table__
+
+CARD_COLUMNS = (
+    cards_table.c.id,
+    cards_table.c.balance,
+    cards_table.c.product,
+    cards_table.c.status,
+    cards_table.c.type,
+    cards_table.c.customer_id,
+)
+
+
+def apply_delta(
+    db: Session,
+    card_id: str,
+    delta: float,
+    reason: str,
+    reference: Optional[str] = None,
+    min_balance: Optional[float] = None,
+    record: bool = True,
+    **values
+):
+    """Atomically add `delta` to a card's balance and append a ledger entry.
+
+    The change is a single conditional UPDATE ... RETURNING, so concurrent
+    writers never overwrite each other. With `min_balance` the update only
+    applies while the resulting balance stays at or above it. Extra keyword
+    arguments are written to the same row in the same statement.
+
+    Returns the updated card row, or None when the card does not exist or
+    the balance condition failed. The caller owns the transaction.
+    """
+    if not delta and not values:
+        return db.execute(select(*CARD_COLUMNS).where(cards_table.c.id == card_id)).first()
+
+    stmt = update(cards_table).where(cards_table.c.id == card_id)
+    if min_balance is not None:
+        stmt = stmt.where(cards_table.c.balance >= min_balance - delta)
+    stmt = stmt.values(balance=cards_table.c.balance + delta, **values).returning(*CARD_COLUMNS)
+
+    card = db.execute(stmt).first()
+    if card is not None:
+        invalidate_card(db, card_id, card.customer_id)
+    if card is not None and delta:
+        bump(db, total_balance=delta)
+    if card is not None and delta and record:
+        append_entries(db, [{
+            "card_id": card_id,
+            "delta": delta,
+            "balance_after": card.balance,
+            "reason": reason,
+            "reference": reference,
+        }])
+    return card
+
+
+def append_entries(db: Session, entries: List[dict]) -> None:
+    """Bulk-append ledger rows for balance changes the caller already applied."""
+    if not entries:
+        return
+    created_at = datetime.now()
+    db.execute(insert(CardLedger), [{"created_at": created_at, **entry} for entry in entries])
@@ -1,8 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from api import router
-from database import Base, engine
-from routers import auth
+from database import Base, engine, SessionLocal, WriteSessionLocal, DB_ASYNC
+from routers import auth, export, imports
+from ids import ensure_counters
+from migrations import run_migrations
+from stats import start_reconciler, reconcile
+from metrics import MetricsMiddleware, render as render_metrics
+from querycount import QueryCountMiddleware, SQL_QUERY_CHECKS
+from cache import entity_cache
+from etags import ensure_versions
+from passwords import password_pool
+from idempotency import replays
 import models
 
 app = FastAPI()
@@ -13,14 +23,89 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+if SQL_QUERY_CHECKS:
+    # Inside MetricsMiddleware, whose per-request statement counts it reads.
+    app.add_middleware(QueryCountMiddleware)
+
+app.add_middleware(MetricsMiddleware)
+
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+ensure_counters(engine)
+ensure_versions(engine)
+
+if DB_ASYNC:
+    # Async twins of the hot routes go first so they take precedence.
+    from api_async import router as async_router
+    app.include_router(async_router)
 
 app.include_router(router)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 
+app.include_router(export.router, prefix="/export", tags=["export"])
+
+app.include_router(imports.router, prefix="/import", tags=["import"])
+
+@app.on_event("startup")
+def start_stats_reconciler():
+    app.state.stop_stats_reconciler = start_reconciler(SessionLocal, WriteSessionLocal)
+
+@app.on_event("shutdown")
+def stop_stats_reconciler():
+    app.state.stop_stats_reconciler.set()
+    password_pool.shutdown()
+
+@app.get("/admin/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, SQL, pool and threadpool metrics in Prometheus text format"""
+    from database import pool_stats
+    return PlainTextResponse(render_metrics(pool_stats(), entity_cache.snapshot()), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/db-pool")
+def get_db_pool_stats():
+    """Connection pool checkouts, wait times and occupancy per engine"""
+    from database import pool_stats
+    return pool_stats()
+
+@app.get("/admin/password-pool")
+def get_password_pool_stats():
+    """bcrypt pool size, jobs in flight and admissions rejected"""
+    return password_pool.snapshot()
+
+@app.get("/admin/cache")
+def get_cache_stats():
+    """Entity cache backend, size and hit/miss counts"""
+    return entity_cache.snapshot()
+
+@app.get("/admin/query-checks")
+def get_query_checks():
+    """Recent query budget overruns and N+1 patterns (SQL_QUERY_CHECKS=1 only)"""
+    from querycount import violations
+    return {"enabled": SQL_QUERY_CHECKS, "violations": list(violations)}
+
+@app.get("/admin/tap-archive")
+def get_tap_archive():
+    """Tap history partitions in the database and the months archived to files"""
+    from partitions import list_partitions
+    from tap_archive import TAP_ARCHIVE_DIR, TAP_RETENTION_MONTHS, catalog
+    with engine.connect() as conn:
+        partitions = list_partitions(conn)
+    with SessionLocal() as db:
+        archives = [
+            {"file": a.file, "month": a.month, "rows": a.row_count, "first_tap": a.first_tap, "last_tap": a.last_tap}
+            for a in catalog(db)
+        ]
+    return {
+        "retention_months": TAP_RETENTION_MONTHS,
+        "archive_dir": TAP_ARCHIVE_DIR,
+        "partitions": partitions,
+        "archives": archives,
+    }
+
 @app.get("/admin/db-info")
 def get_db_info():
     try:
@@ -85,6 +170,7 @@ def generate_data():
     try:
         from generate_data import main as generate_main
         generate_main()
+        entity_cache.clear()
         return {"status": "success", "message": "Data generated"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -94,8 +180,17 @@ def reset_database():
     try:
         from database import Base, engine
         print("Resetting database schema...")
+        from ids import reset_cache
         Base.metadata.drop_all(bind=engine)
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        reset_cache()
+        entity_cache.clear()
+        replays.clear()
+        ensure_counters(engine)
+        ensure_versions(engine)
+        with SessionLocal() as read_db, WriteSessionLocal() as db:
+            reconcile(db, read_db)
         return {"status": "success", "message": "Database schema reset successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -105,6 +200,7 @@ def delete_db():
     try:
         from delete_db import delete_database
         delete_database()
+        entity_cache.clear()
         return {"status": "success", "message": "Database deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -0,0 +1,247 @@
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import anyio.to_thread
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds in seconds; the implicit last bucket is +Inf.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+
+
+class RouteStats:
+    __slots__ = ("statuses", "latency", "db_time", "statements", "response_bytes")
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram()
+        self.db_time = Histogram()
+        self.statements = 0
+        self.response_bytes = 0
+
+
+class RequestStats:
+    """Per-request accumulator that the SQLAlchemy hooks write into.
+
+    `by_statement` is only set when something asks for per-SQL counts
+    (querycount's N+1 checks); otherwise the hooks skip it.
+    """
+    __slots__ = ("db_time", "statements", "statement_started", "by_statement")
+
+    def __init__(self, by_statement: Optional[Counter] = None):
+        self.db_time = 0.0
+        self.statements = 0
+        self.statement_started = 0.0
+        self.by_statement = by_statement
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+_routes = {}
+_in_flight = 0
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route request metrics.
+
+    All bookkeeping happens on the event loop thread, so the counters need
+    no locks. Sync routes run in the threadpool with a copy of the request
+    context, which still points at the same RequestStats object, so the
+    statement hooks below attribute DB time to the right request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_stats = RequestStats()
+        token = _current.set(request_stats)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        _in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_flight -= 1
+            _current.reset(token)
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else UNMATCHED_ROUTE)
+            stats = _routes.get(key)
+            if stats is None:
+                stats = _routes[key] = RouteStats()
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.observe(elapsed)
+            stats.db_time.observe(request_stats.db_time)
+            stats.statements += request_stats.statements
+            stats.response_bytes += size
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _statement_start(conn, cursor, statement, parameters, context, executemany):
+    request_stats = _current.get()
+    if request_stats is not None:
+        request_stats.statement_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _statement_end(conn, cursor, statement, parameters, context, executemany):
+    request_stats = _current.get()
+    if request_stats is not None:
+        request_stats.db_time += time.perf_counter() - request_stats.statement_started
+        request_stats.statements += 1
+        if request_stats.by_statement is not None:
+            request_stats.by_statement[statement] += 1
+
+
+def current_request() -> Optional[RequestStats]:
+    """The RequestStats of the request being served, if any"""
+    return _current.get()
+
+
+@contextmanager
+def recording(request_stats: RequestStats):
+    """Attribute the statements run inside the block to `request_stats`"""
+    token = _current.set(request_stats)
+    try:
+        yield request_stats
+    finally:
+        _current.reset(token)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _histogram_lines(name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.counts):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        yield f'{name}_bucket{{{labels},le="{le}"}} {cumulative}'
+    yield f"{name}_sum{{{labels}}} {histogram.total:.6f}"
+    yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+def render(pools: dict, cache: Optional[dict] = None) -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4).
+
+    Must be called on the event loop thread, where the threadpool limiter
+    can be read.
+    """
+    lines = [
+        "# HELP http_requests_total Requests by route template and status.",
+        "# TYPE http_requests_total counter",
+    ]
+    routes = sorted(_routes.items())
+    for (method, path), stats in routes:
+        for status, count in sorted(stats.statuses.items()):
+            lines.append(f"http_requests_total{{{_labels(method=method, route=path, status=status)}}} {count}")
+
+    lines += [
+        "# HELP http_request_duration_seconds Request latency by route template.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, path), stats in routes:
+        lines.extend(_histogram_lines("http_request_duration_seconds", _labels(method=method, route=path), stats.latency))
+
+    lines += [
+        "# HELP http_request_db_seconds Time spent executing SQL per request.",
+        "# TYPE http_request_db_seconds histogram",
+    ]
+    for (method, path), stats in routes:
+        lines.extend(_histogram_lines("http_request_db_seconds", _labels(method=method, route=path), stats.db_time))
+
+    lines += [
+        "# HELP http_request_sql_statements_total SQL statements executed by route template.",
+        "# TYPE http_request_sql_statements_total counter",
+    ]
+    for (method, path), stats in routes:
+        lines.append(f"http_request_sql_statements_total{{{_labels(method=method, route=path)}}} {stats.statements}")
+
+    lines += [
+        "# HELP http_response_bytes_total Response body bytes by route template.",
+        "# TYPE http_response_bytes_total counter",
+    ]
+    for (method, path), stats in routes:
+        lines.append(f"http_response_bytes_total{{{_labels(method=method, route=path)}}} {stats.response_bytes}")
+
+    lines += [
+        "# HELP http_requests_in_flight Requests currently being served.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {_in_flight}",
+    ]
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    lines += [
+        "# HELP threadpool_threads_busy Worker threads running sync routes.",
+        "# TYPE threadpool_threads_busy gauge",
+        f"threadpool_threads_busy {limiter.borrowed_tokens}",
+        "# HELP threadpool_threads_max Size of the threadpool for sync routes.",
+        "# TYPE threadpool_threads_max gauge",
+        f"threadpool_threads_max {limiter.total_tokens}",
+    ]
+
+    pool_metrics = (
+        ("db_pool_size", "gauge", "size", "Configured pool size."),
+        ("db_pool_checked_out", "gauge", "checked_out", "Connections currently checked out."),
+        ("db_pool_overflow", "gauge", "overflow", "Connections open beyond the pool size."),
+        ("db_pool_checkouts_total", "counter", "checkouts", "Connections handed out."),
+        ("db_pool_timeouts_total", "counter", "timeouts", "Checkouts that gave up waiting."),
+        ("db_pool_wait_seconds_total", "counter", "wait_seconds_total", "Time spent waiting for a connection."),
+    )
+    for name, kind, key, help_text in pool_metrics:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for engine_name, snapshot in sorted(pools.items()):
+            if key in snapshot:
+                lines.append(f'{name}{{engine="{engine_name}"}} {snapshot[key]}')
+
+    if cache:
+        cache_metrics = (
+            ("entity_cache_hits_total", "counter", "hits", "Card/customer reads served from the cache."),
+            ("entity_cache_misses_total", "counter", "misses", "Card/customer reads that went to the database."),
+            ("entity_cache_invalidations_total", "counter", "invalidations", "Entries dropped by committed writes."),
+            ("entity_cache_evictions_total", "counter", "evictions", "Entries pushed out by the size limit."),
+            ("entity_cache_size", "gauge", "size", "Entries currently cached."),
+        )
+        for name, kind, key, help_text in cache_metrics:
+            if key in cache:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}",
+                          f'{name}{{backend="{cache["backend"]}"}} {cache[key]}']
+
+    return "\n".join(lines) + "\n"
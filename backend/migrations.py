@@ -0,0 +1,184 @@
+from datetime import datetime
+from functools import partial
+from typing import List
+
+from sqlalchemy import inspect, insert, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+
+from database import Base, without_statement_timeout
+from models import SchemaMigration, StatsCounter, TableVersion, TapArchive
+from partitions import ensure_partitions, partition_table
+
+
+def _declared_indexes():
+    for table in Base.metadata.sorted_tables:
+        yield from sorted(table.indexes, key=lambda ix: ix.name)
+
+
+def ensure_indexes(conn) -> None:
+    """Create every index declared on the models that the database is missing.
+
+    A plain CREATE INDEX IF NOT EXISTS inside the caller's transaction, which
+    blocks writes to the table while it builds: for rebuilding indexes after
+    a bulk load (generate_data.py). Running databases get new indexes
+    through the build_index migration steps instead.
+    """
+    for index in _declared_indexes():
+        conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _rewrite(ddl: str, old: str, new: str) -> str:
+    if old not in ddl:
+        raise RuntimeError(f"Unexpected index DDL: {ddl}")
+    return ddl.replace(old, new, 1)
+
+
+def _drop_invalid(conn, name: str) -> None:
+    # An interrupted CONCURRENTLY build leaves an invalid index behind that
+    # IF NOT EXISTS would otherwise keep forever.
+    if conn.execute(text(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+    ), {"name": name}).scalar():
+        conn.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+
+
+def _partitions(conn, table: str) -> List[str]:
+    return list(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:name) AND c.relkind IN ('r', 'p') ORDER BY c.relname"
+    ), {"name": table}).scalars())
+
+
+def build_index(conn, index) -> None:
+    """Create one declared index if it is missing, without blocking writes.
+
+    On PostgreSQL this is CREATE INDEX CONCURRENTLY, so `conn` must be in
+    autocommit mode. PostgreSQL cannot build an index on a partitioned table
+    concurrently; there the index is created ON ONLY the parent, built
+    concurrently on each partition and attached. Elsewhere it is a plain
+    CREATE INDEX IF NOT EXISTS.
+    """
+    if conn.dialect.name != "postgresql":
+        conn.execute(CreateIndex(index, if_not_exists=True))
+        return
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    table = index.table.name
+    head = f" INDEX IF NOT EXISTS {index.name} ON {table} "
+    partitioned = conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:name)"
+    ), {"name": table}).scalar()
+    if not partitioned:
+        _drop_invalid(conn, index.name)
+        conn.execute(text(_rewrite(ddl, head, f" INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON {table} ")))
+        return
+
+    conn.execute(text(_rewrite(ddl, head, f" INDEX IF NOT EXISTS {index.name} ON ONLY {table} ")))
+    for partition in _partitions(conn, table):
+        attached = conn.execute(text(
+            "SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:index) AND x.indrelid = to_regclass(:partition)"
+        ), {"index": index.name, "partition": partition}).scalar()
+        if attached:
+            continue
+        name = f"{partition}_{index.name}"
+        _drop_invalid(conn, name)
+        conn.execute(text(_rewrite(ddl, head, f" INDEX CONCURRENTLY IF NOT EXISTS {name} ON {partition} ")))
+        conn.execute(text(f"ALTER INDEX {index.name} ATTACH PARTITION {name}"))
+
+
+def _shard_counters(conn) -> None:
+    """Rebuild stats_counters and table_versions with their shard column.
+
+    Existing values move to shard 0; the other shards are seeded at
+    start-up by stats.reconcile and etags.ensure_versions. Tables that
+    create_all already built sharded are left alone.
+    """
+    for table, value in ((StatsCounter.__table__, "value"), (TableVersion.__table__, "version")):
+        if "shard" in {column["name"] for column in inspect(conn).get_columns(table.name)}:
+            continue
+        legacy = f"{table.name}_unsharded"
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy}"))
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table.name}_pkey TO {legacy}_pkey"))
+        table.create(conn)
+        conn.execute(text(f"INSERT INTO {table.name} (name, shard, {value}) SELECT name, 0, {value} FROM {legacy}"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+
+
+def _archive_id_range(conn) -> None:
+    """Add tap_archives.first_id and last_id; earlier files keep NULLs and are always searched"""
+    table = TapArchive.__table__
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for column in (table.c.first_id, table.c.last_id):
+        if column.name not in existing:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"))
+
+
+# Ordered, named one-off steps as (name, step, in_transaction). Each runs
+# once per database and is recorded in schema_migrations. Steps with
+# in_transaction=False get an autocommit connection, as CREATE INDEX
+# CONCURRENTLY requires; they must be safe to re-run after an interruption.
+MIGRATIONS = [
+    ("shard_counters", _shard_counters, True),
+    # Copies tap_history into its partitioned form (PostgreSQL only);
+    # rebuilds the table's indexes itself.
+    ("partition_tap_history", partition_table, True),
+    ("tap_archive_id_range", _archive_id_range, True),
+    # create_all builds these with new tables; the steps bring them to
+    # databases whose tables already existed.
+    *((f"index_{index.name}", partial(build_index, index=index), False) for index in _declared_indexes()),
+]
+
+
+def _run_step(engine, name, step, in_transaction) -> None:
+    if in_transaction:
+        with engine.begin() as conn:
+            without_statement_timeout(conn)
+            step(conn)
+            conn.execute(insert(SchemaMigration).values(name=name, applied_at=datetime.now()))
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # SET LOCAL means nothing outside a transaction; undo it by hand.
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET statement_timeout = 0"))
+        try:
+            step(conn)
+        finally:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("RESET statement_timeout"))
+    with engine.begin() as conn:
+        conn.execute(insert(SchemaMigration).values(name=name, applied_at=datetime.now()))
+
+
+def run_migrations(engine) -> None:
+    """Apply the MIGRATIONS this database has not recorded, then premake tap partitions.
+
+    Beyond the recorded steps, start-up only creates the coming months'
+    tap_history partitions. On PostgreSQL a session advisory lock makes
+    workers starting together take turns, so each step runs once.
+    """
+    with engine.connect() as lock:
+        postgres = lock.dialect.name == "postgresql"
+        if postgres:
+            lock.execute(text("SELECT pg_advisory_lock(hashtext('schema_migrations'))"))
+            lock.commit()
+        try:
+            with engine.begin() as conn:
+                applied = set(conn.execute(select(SchemaMigration.name)).scalars())
+            for name, step, in_transaction in MIGRATIONS:
+                if name in applied:
+                    continue
+                try:
+                    _run_step(engine, name, step, in_transaction)
+                    print(f"Applied migration {name}")
+                except IntegrityError:
+                    # Another worker recorded it first.
+                    pass
+        finally:
+            if postgres:
+                lock.execute(text("SELECT pg_advisory_unlock(hashtext('schema_migrations'))"))
+                lock.commit()
+
+    with engine.begin() as conn:
+        ensure_partitions(conn)
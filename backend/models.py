@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, text, UniqueConstraint, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, text, UniqueConstraint, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -31,6 +31,13 @@ class Card(Base):
     customer = relationship("Customer", back_populates="cards")
     trips = relationship("Trip", back_populates="card", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_cards_customer_id", "customer_id"),
+        # For the card sampler's filtered seeks along the primary key.
+        Index("ix_cards_status_id", "status", "id"),
+        Index("ix_cards_type_id", "type", "id"),
+    )
+
 class Trip(Base):
     __tablename__ = "trips"
 
@@ -48,6 +55,17 @@ class Trip(Base):
     card_id = Column(String, ForeignKey("cards.id", ondelete="CASCADE"), nullable=False)
     card = relationship("Card", back_populates="trips")
 
+    # Trip search sorts by (start_time, id); each equality filter gets a
+    # composite so the filter and the sort are served by one index range.
+    __table_args__ = (
+        Index("ix_trips_start_time_id", "start_time", "id"),
+        Index("ix_trips_transit_mode_start_time", "transit_mode", "start_time"),
+        Index("ix_trips_operator_start_time", "operator", "start_time"),
+        Index("ix_trips_entry_location_start_time", "entry_location", "start_time"),
+        Index("ix_trips_route_start_time", "route", "start_time"),
+        Index("ix_trips_card_id_start_time", "card_id", start_time.desc()),
+    )
+
 class Case(Base):
     __tablename__ = "cases"
 
@@ -65,6 +83,12 @@ class Case(Base):
     customer = relationship("Customer", back_populates="cases")
     card = relationship("Card")
 
+    __table_args__ = (
+        Index("ix_cases_customer_id_created_date", "customer_id", created_date.desc()),
+        Index("ix_cases_created_date_id", created_date.desc(), id.desc()),
+        Index("ix_cases_card_id", "card_id"),
+    )
+
 class TapHistory(Base):
     __tablename__ = "tap_history"
 
@@ -79,6 +103,11 @@ class TapHistory(Base):
     
     customer = relationship("Customer")
 
+    __table_args__ = (
+        Index("ix_tap_history_customer_id_tap_time", "customer_id", tap_time.desc(), id.desc()),
+        Index("ix_tap_history_tap_time_id", tap_time.desc(), id.desc()),
+    )
+
 class FareDispute(Base):
     __tablename__ = "fare_disputes"
 
@@ -93,6 +122,11 @@ class FareDispute(Base):
     card = relationship("Card")
     trip = relationship("Trip")
 
+    __table_args__ = (
+        Index("ix_fare_disputes_card_id", "card_id"),
+        Index("ix_fare_disputes_trip_id", "trip_id"),
+    )
+
 class User(Base):
     __tablename__ = "users"
     
@@ -101,4 +135,74 @@ class User(Base):
     password = Column(String)
     name = Column(String)
     created_at = Column(DateTime)
-    last_login = Column(DateTime, nullable=True) 
\ No newline at end of file
+    last_login = Column(DateTime, nullable=True) 
+
+class IdCounter(Base):
+    __tablename__ = "id_counters"
+
+    name = Column(String, primary_key=True)
+    next_value = Column(Integer, nullable=False)
+
+class CardLedger(Base):
+    __tablename__ = "card_ledger"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    card_id = Column(String, ForeignKey("cards.id", ondelete="CASCADE"), nullable=False)
+    delta = Column(Float, nullable=False)
+    balance_after = Column(Float, nullable=False)
+    reason = Column(String, nullable=False)
+    reference = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_card_ledger_card_id_created_at", "card_id", "created_at"),
+    )
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime, nullable=False, default=datetime.now)
+
+class StatsCounter(Base):
+    __tablename__ = "stats_counters"
+
+    name = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    value = Column(Float, nullable=False, default=0.0)
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    version = Column(Integer, nullable=False, default=0)
+
+class TapArchive(Base):
+    __tablename__ = "tap_archives"
+
+    file = Column(String, primary_key=True)
+    month = Column(String, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    first_tap = Column(DateTime, nullable=False)
+    last_tap = Column(DateTime, nullable=False)
+    # Lowest and highest tap ID in the file, shortest first (tap_archive.id_key);
+    # NULL for files archived before they were recorded.
+    first_id = Column(String, nullable=True)
+    last_id = Column(String, nullable=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_tap_archives_last_tap", last_tap.desc()),
+    )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row on a page into an opaque token."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> Tuple:
+    """Unpack a token from encode_cursor, converting each value to the given type."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if len(payload) != len(types):
+            raise ValueError("cursor has the wrong shape")
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for value, kind in zip(payload, types)
+        )
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+
+
+def next_cursor(rows, limit: int, *attrs) -> Optional[str]:
+    """Cursor for the page after `rows`, or None if this was the last page."""
+    if not rows or not limit or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(*(getattr(last, attr) for attr in attrs))
+
+
+def keyset(query, cursor: Optional[str], *columns, descending: bool = False):
+    """Order `query` by `columns` and, given a cursor, resume right after the row it encodes.
+
+    Seeking on the sort key instead of OFFSET keeps every page an index range
+    scan, no matter how deep into the table it is.
+    """
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    if cursor:
+        values = decode_cursor(cursor, *(column.type.python_type for column in columns))
+        after = tuple_(*values) if len(columns) > 1 else values[0]
+        query = query.filter(key < after if descending else key > after)
+    return query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+
+
+def set_next_cursor(response: Response, rows, limit: int, *attrs) -> None:
+    """Expose the cursor for the following page as an X-Next-Cursor header."""
+    cursor = next_cursor(rows, limit, *attrs)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
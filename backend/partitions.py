@@ -0,0 +1,161 @@
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+from models import TapHistory
+
+# On PostgreSQL tap_history is range-partitioned on tap_time, one partition
+# per calendar month (tap_history_YYYY_MM) plus tap_history_default for rows
+# no month partition covers. Queries that filter on tap_time only scan the
+# months they name, and tap_archive.py retires a month by dropping its
+# partition. SQLite has no partitioning; there tap_history stays one table
+# and the archival job keeps it down to the retention window instead.
+#   TAP_PARTITION_PREMAKE  months ahead of the current one to create up front
+TAP_PARTITION_PREMAKE = int(os.getenv("TAP_PARTITION_PREMAKE", "2"))
+
+TABLE = TapHistory.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def months(start: datetime, end: datetime) -> Iterator[datetime]:
+    """First day of every month from start's to end's, inclusive"""
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def _literal(value: datetime) -> str:
+    # Partition bounds are DDL and cannot be bound parameters; the values
+    # are month starts computed here, never user input.
+    return f"'{value:%Y-%m-%d %H:%M:%S}'"
+
+
+def _exists(conn, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def is_partitioned(conn) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"
+    ), {"name": TABLE}).scalar())
+
+
+def _convert(conn) -> None:
+    """Rebuild a plain tap_history as a partitioned table, keeping its rows.
+
+    The primary key becomes (id, tap_time), since PostgreSQL requires the
+    partition key in every unique constraint; IDs stay unique because the
+    tap_history sequence hands them out. Secondary indexes are rebuilt on
+    the new table once its rows are in.
+    """
+    legacy = f"{TABLE}_unpartitioned"
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {TABLE}_pkey TO {legacy}_pkey"))
+    for index in TapHistory.__table__.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    conn.execute(text(f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (tap_time)"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, tap_time)"))
+    conn.execute(text(
+        f"ALTER TABLE {TABLE} ADD FOREIGN KEY (customer_id) REFERENCES customers (id) ON DELETE CASCADE"
+    ))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+    first, last = conn.execute(text(f"SELECT min(tap_time), max(tap_time) FROM {legacy}")).one()
+    if first is not None:
+        for month in months(first, last):
+            _create_month(conn, month)
+    conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {legacy}"))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    for index in TapHistory.__table__.indexes:
+        conn.execute(CreateIndex(index))
+
+
+def _create_month(conn, month: datetime) -> None:
+    name = partition_name(month)
+    if _exists(conn, name):
+        return
+    lo, hi = _literal(month), _literal(add_months(month, 1))
+    in_range = f"tap_time >= {lo} AND tap_time < {hi}"
+    if conn.execute(text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range} LIMIT 1")).scalar():
+        # Rows for this month already landed in the default partition;
+        # move them over, or PostgreSQL refuses the new partition.
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)"))
+        conn.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+        conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+        conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ({lo}) TO ({hi})"))
+    else:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM ({lo}) TO ({hi})"))
+
+
+def partition_table(conn) -> None:
+    """Convert a plain tap_history into the partitioned layout; a no-op once it is.
+
+    Copies every row, so it runs as the recorded partition_tap_history
+    migration rather than on every start. Does nothing outside PostgreSQL.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": TABLE})
+    if not is_partitioned(conn):
+        _convert(conn)
+
+
+def ensure_partitions(conn, start: Optional[datetime] = None, end: Optional[datetime] = None) -> None:
+    """Create the month partitions tap_history needs.
+
+    Covers the months from `start` (default: this month) through
+    TAP_PARTITION_PREMAKE months past `end` (default: now). Idempotent, and
+    serialized with an advisory lock so several workers can run it at
+    start-up. Does nothing outside PostgreSQL or before partition_table.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    now = datetime.now()
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": TABLE})
+    if not is_partitioned(conn):
+        return
+    for month in months(start or now, add_months(month_start(end or now), TAP_PARTITION_PREMAKE)):
+        _create_month(conn, month)
+
+
+def drop_month(conn, month: datetime) -> bool:
+    """Detach and drop an emptied month partition; False if it has rows or does not exist"""
+    if conn.dialect.name != "postgresql":
+        return False
+    name = partition_name(month)
+    if not _exists(conn, name):
+        return False
+    conn.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+    if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).scalar():
+        return False
+    conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
+    return True
+
+
+def list_partitions(conn) -> list:
+    """Month partitions of tap_history with their row estimates, oldest first"""
+    if conn.dialect.name != "postgresql" or not is_partitioned(conn):
+        return []
+    rows = conn.execute(text(
+        "SELECT c.relname, c.reltuples::bigint FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:name) ORDER BY c.relname"
+    ), {"name": TABLE})
+    return [{"partition": name, "estimated_rows": max(estimate, 0)} for name, estimate in rows]
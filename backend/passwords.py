@@ -0,0 +1,107 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import anyio.to_thread
+import bcrypt
+
+# bcrypt work runs in its own process pool so a login storm cannot tie up
+# the threadpool (or the GIL) that every sync route shares.
+#   BCRYPT_ROUNDS           cost factor for new hashes (existing hashes keep theirs)
+#   PASSWORD_WORKERS        pool processes; 0 hashes on the shared threadpool as before
+#   PASSWORD_QUEUE_LIMIT    jobs admitted at once, running or queued in the pool
+#   PASSWORD_QUEUE_TIMEOUT  seconds a request waits for admission before a 503
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(PASSWORD_WORKERS * 8)))
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", "5"))
+
+
+class PasswordQueueFull(Exception):
+    """No room in the password pool within PASSWORD_QUEUE_TIMEOUT"""
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class PasswordPool:
+    """Bounded process pool with an admission queue in front of it.
+
+    The executor and semaphore are created on first use, on the serving
+    event loop. Workers are spawned rather than forked so they do not
+    inherit the server's threads or open database connections.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, limit: int = PASSWORD_QUEUE_LIMIT,
+                 timeout: float = PASSWORD_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.limit = limit
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._admission: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        if self.workers <= 0:
+            return await anyio.to_thread.run_sync(fn, *args)
+        if self._admission is None:
+            self._admission = asyncio.Semaphore(self.limit)
+        try:
+            await asyncio.wait_for(self._admission.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PasswordQueueFull()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._admission.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.limit,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+        self._admission = None
+
+
+password_pool = PasswordPool()
+
+
+async def hash_password(password: str) -> str:
+    return await password_pool.run(_hash, password, BCRYPT_ROUNDS)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(_verify, plain_password, hashed_password)
@@ -0,0 +1,88 @@
+import threading
+import time
+from functools import lru_cache
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Running totals for one connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+class _InstrumentedPool:
+    """Times every checkout, including the wait for a free connection.
+
+    The stats object survives engine.dispose(), which replaces the pool
+    through recreate().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+@lru_cache(maxsize=None)
+def instrumented_async_queue_pool():
+    """The async pool class, built on first use so sync-only installs never import the asyncio extras"""
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+        pass
+    return InstrumentedAsyncQueuePool
+
+
+def pool_snapshot(engine) -> dict:
+    pool = engine.pool
+    snapshot = pool.stats.snapshot() if hasattr(pool, "stats") else {}
+    snapshot.update({
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    })
+    return snapshot
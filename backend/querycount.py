@@ -0,0 +1,99 @@
+import logging
+import os
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from metrics import RequestStats, current_request, recording
+
+# SQL_QUERY_CHECKS=1 turns on per-request statement counting and N+1
+# detection (development and CI); it is off by default in production.
+# The metrics hooks already count every request's statements; the checks
+# only ask them to keep per-SQL counts as well.
+SQL_QUERY_CHECKS = os.getenv("SQL_QUERY_CHECKS", "").lower() in ("1", "true", "yes")
+# The same statement this many times in one request is reported as N+1.
+NPLUSONE_THRESHOLD = int(os.getenv("SQL_NPLUSONE_THRESHOLD", "3"))
+
+logger = logging.getLogger("querycount")
+
+# Most recent problems seen by the middleware, for /admin/query-checks and CI.
+violations = deque(maxlen=500)
+
+
+def repeated(request_stats: RequestStats, threshold: int = NPLUSONE_THRESHOLD):
+    """Statements run at least `threshold` times, i.e. likely N+1 loops"""
+    return [(sql, n) for sql, n in (request_stats.by_statement or Counter()).most_common() if n >= threshold]
+
+
+@contextmanager
+def track_queries():
+    """Count the statements executed in this block (and threads it starts via the context)"""
+    with recording(RequestStats(by_statement=Counter())) as request_stats:
+        yield request_stats
+
+
+@contextmanager
+def assert_max_queries(budget: int):
+    """Fail with AssertionError when the block runs more than `budget` statements"""
+    with track_queries() as request_stats:
+        yield request_stats
+    if request_stats.statements > budget:
+        raise AssertionError(
+            f"{request_stats.statements} SQL statements, budget is {budget}:\n" + "\n".join(
+                f"  {n}x {sql}" for sql, n in request_stats.by_statement.most_common()
+            )
+        )
+
+
+def query_budget(limit: int):
+    """Declare the most statements a route may execute; checked by QueryCountMiddleware"""
+    def decorator(func):
+        func.__query_budget__ = limit
+        return func
+    return decorator
+
+
+class QueryCountMiddleware:
+    """Reports N+1 patterns and budget overruns from the request's metrics.
+
+    Must sit inside MetricsMiddleware. Adds an X-Query-Count response
+    header and logs a warning for every problem, also keeping it in
+    `violations`. Streaming responses are counted up to the point their
+    headers are sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        request_stats = current_request() if scope["type"] == "http" else None
+        if request_stats is None:
+            await self.app(scope, receive, send)
+            return
+        request_stats.by_statement = Counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-query-count", str(request_stats.statements).encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.check(scope, request_stats)
+
+    @staticmethod
+    def check(scope, request_stats: RequestStats) -> None:
+        route = scope.get("route")
+        if route is None:
+            return
+        where = f"{scope['method']} {route.path}"
+        count = request_stats.statements
+        budget = getattr(route.endpoint, "__query_budget__", None)
+        if budget is not None and count > budget:
+            violations.append({"route": where, "kind": "budget", "count": count, "budget": budget})
+            logger.warning("%s ran %d SQL statements (budget %d)", where, count, budget)
+        for sql, n in repeated(request_stats):
+            violations.append({"route": where, "kind": "n+1", "count": n, "statement": sql})
+            logger.warning("%s ran the same statement %d times (possible N+1): %s", where, n, sql)
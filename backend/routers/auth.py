@@ -1,13 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
-import bcrypt
 import jwt
 from typing import Optional
 
-from database import SessionLocal
+from database import SessionLocal, WriteSessionLocal, tag
 from models import User
+from ids import next_id
+from passwords import PasswordQueueFull, hash_password, verify_password
 
 router = APIRouter()
 
@@ -30,18 +33,25 @@ class Token(BaseModel):
     user_name: str
 
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(info=tag("auth"))
     try:
         yield db
     finally:
         db.close()
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+def get_write_db():
+    db = WriteSessionLocal(info=tag("auth"))
+    try:
+        yield db
+    finally:
+        db.close()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+def password_queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-ins in progress, please retry",
+        headers={"Retry-After": "1"}
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -52,23 +62,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def find_user(db: Session, email: str) -> Optional[User]:
+    # End the read right away so no connection is held while bcrypt runs.
+    user = db.query(User).filter(User.email == email).first()
+    if user is not None:
+        db.expunge(user)
+    db.rollback()
+    return user
+
+# signup and login are async so bcrypt can be awaited in the password pool
+# without holding a threadpool worker; their short database steps are
+# handed to the threadpool explicitly.
 @router.post("/signup", response_model=Token)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == user.email).first():
+async def signup(user: UserCreate, read_db: Session = Depends(get_db), db: Session = Depends(get_write_db)):
+    if await run_in_threadpool(find_user, read_db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = hash_password(user.password)
-    db_user = User(
-        id=f"U{str(len(db.query(User).all()) + 1).zfill(3)}",
-        email=user.email,
-        password=hashed_password,
-        name=user.name,
-        created_at=datetime.now()
-    )
+    try:
+        hashed_password = await hash_password(user.password)
+    except PasswordQueueFull:
+        raise password_queue_full()
+    
+    def create_user():
+        db_user = User(
+            id=next_id(db, "user"),
+            email=user.email,
+            password=hashed_password,
+            name=user.name,
+            created_at=datetime.now()
+        )
+        db.add(db_user)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Someone signed up with the same email while we were hashing.
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Email already registered")
+        db.refresh(db_user)
+        return db_user
     
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db_user = await run_in_threadpool(create_user)
     
     access_token = create_access_token(
         data={"sub": user.email},
@@ -81,16 +114,25 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_credentials.email).first()
-    if not user or not verify_password(user_credentials.password, user.password):
+async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(find_user, db, user_credentials.email)
+    try:
+        valid = user is not None and await verify_password(user_credentials.password, user.password)
+    except PasswordQueueFull:
+        raise password_queue_full()
+    if not valid:
         raise HTTPException(
             status_code=401,
             detail="Incorrect email or password"
         )
     
-    user.last_login = datetime.now()
-    db.commit()
+    def record_login():
+        # Only this short UPDATE takes the writer.
+        with WriteSessionLocal(info=tag("auth")) as write_db:
+            write_db.query(User).filter(User.id == user.id).update({"last_login": datetime.now()})
+            write_db.commit()
+    
+    await run_in_threadpool(record_login)
     
     access_token = create_access_token(
         data={"sub": user.email},
@@ -0,0 +1,110 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from datetime import datetime, date
+from functools import partial
+from typing import Optional
+import csv
+import io
+import json
+
+from database import SessionLocal, tag, without_statement_timeout
+from models import Customer, Card, Trip, Case, TapHistory, FareDispute
+from tap_archive import archived_batches
+from api import verify_api_key
+
+router = APIRouter()
+
+# Table name in the URL -> (model, column the time-range filters apply to)
+EXPORTS = {
+    "customers": (Customer, Customer.join_date),
+    "cards": (Card, Card.issue_date),
+    "trips": (Trip, Trip.start_time),
+    "cases": (Case, Case.created_date),
+    "tap-history": (TapHistory, TapHistory.tap_time),
+    "fare-disputes": (FareDispute, FareDispute.dispute_date),
+}
+
+# Exports whose older rows have moved out of the database: table name ->
+# (db, start, end) -> batches of rows in the model's column order, streamed
+# after the database rows.
+ARCHIVES = {
+    "tap-history": archived_batches,
+}
+
+EXPORT_BATCH_SIZE = 2000
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _stream_rows(stmt, archived=None):
+    # The request-scoped session may be closed before the body is sent, so the
+    # stream owns its own session for as long as the client keeps reading.
+    db = SessionLocal(info=tag("export"))
+    try:
+        if archived is not None and db.get_bind().dialect.name == "postgresql":
+            # One snapshot for the rows and the archive catalog, so a month
+            # archived mid-export is neither missed nor exported twice.
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        # A full export legitimately outlives the per-statement timeout.
+        without_statement_timeout(db.connection())
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield rows
+        if archived is not None:
+            yield from archived(db)
+    finally:
+        db.close()
+
+def _ndjson(stmt, keys, archived=None):
+    for rows in _stream_rows(stmt, archived):
+        yield "".join(
+            json.dumps(dict(zip(keys, row)), default=_json_default) + "\n" for row in rows
+        )
+
+def _csv(stmt, keys, archived=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    for rows in _stream_rows(stmt, archived):
+        writer.writerows(
+            [value.isoformat() if isinstance(value, (datetime, date)) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/{table}")
+def export_table(
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    api_key: str = Depends(verify_api_key)
+):
+    """Stream a whole table as NDJSON or CSV with constant memory; tap history includes archived months"""
+    if table not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{table}'")
+
+    model, time_column = EXPORTS[table]
+    columns = list(model.__table__.columns)
+    keys = [column.name for column in columns]
+    stmt = select(*columns)
+    if start:
+        stmt = stmt.where(time_column >= start)
+    if end:
+        stmt = stmt.where(time_column < end)
+    archived = None
+    if table in ARCHIVES:
+        archived = partial(ARCHIVES[table], start=start, end=end)
+
+    filename = f"{table}.{'csv' if format == 'csv' else 'ndjson'}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "csv":
+        return StreamingResponse(_csv(stmt, keys, archived), media_type="text/csv", headers=headers)
+    return StreamingResponse(_ndjson(stmt, keys, archived), media_type="application/x-ndjson", headers=headers)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+import io
+import tempfile
+
+from database import WriteSessionLocal, tag
+from importer import IMPORTS, IMPORT_CHUNK_SIZE, import_file
+from api import verify_api_key
+
+router = APIRouter()
+
+def _run_import(spool, table, format, chunk_size):
+    spool.seek(0)
+    stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    db = WriteSessionLocal(info=tag("import"))
+    try:
+        return import_file(db, table, stream, format, chunk_size=chunk_size).snapshot()
+    finally:
+        db.close()
+
+@router.post("/{table}")
+async def import_table(
+    table: str,
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=50000),
+    api_key: str = Depends(verify_api_key)
+):
+    """Bulk-load customers or cards from a CSV or NDJSON request body.
+
+    The body is spooled to a temporary file as it arrives and imported
+    chunk by chunk from there, so neither step holds the upload in memory.
+    """
+    if table not in IMPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown import '{table}'")
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    with tempfile.TemporaryFile() as spool:
+        async for data in request.stream():
+            await run_in_threadpool(spool.write, data)
+        try:
+            return await run_in_threadpool(_run_import, spool, table, format, chunk_size)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Import body must be UTF-8 encoded")
@@ -0,0 +1,128 @@
+import os
+import random
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from models import Card
+
+CARD_SAMPLE_RESERVOIR = int(os.getenv("CARD_SAMPLE_RESERVOIR", "10000"))
+CARD_SAMPLE_TTL = float(os.getenv("CARD_SAMPLE_TTL", "300"))
+
+OVERSAMPLE = 4
+LOOKUP_CHUNK = 500
+
+CARD_FIELDS = (Card.id, Card.balance, Card.status, Card.type)
+
+
+class CardSampler:
+    """Draws random cards without scanning the cards table.
+
+    Keeps a reservoir of card IDs gathered by random index probes (rowid on
+    SQLite, TABLESAMPLE SYSTEM on PostgreSQL) and refreshes it every
+    CARD_SAMPLE_TTL seconds. A draw picks candidates from the reservoir and
+    checks them, with any filters, in one primary-key lookup. If the filters
+    are too selective for the reservoir, it seeks forward along the primary
+    key from random reservoir IDs until enough cards match; with a status or
+    type filter the seek runs on the (status, id) or (type, id) index, so it
+    only visits cards that match.
+    """
+
+    def __init__(self, size: int = CARD_SAMPLE_RESERVOIR, ttl: float = CARD_SAMPLE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._ids: List[str] = []
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def sample(self, db: Session, count: int = 1, status: Optional[str] = None,
+               card_type: Optional[str] = None, min_balance: Optional[float] = None):
+        ids = self._reservoir(db)
+        if not ids:
+            return []
+
+        filters = []
+        if status:
+            filters.append(Card.status == status)
+        if card_type:
+            filters.append(Card.type == card_type)
+        if min_balance is not None:
+            filters.append(Card.balance >= min_balance)
+
+        found = {}
+        candidates = random.sample(ids, min(len(ids), count * OVERSAMPLE))
+        for i in range(0, len(candidates), LOOKUP_CHUNK):
+            chunk = candidates[i:i + LOOKUP_CHUNK]
+            for row in db.execute(select(*CARD_FIELDS).where(Card.id.in_(chunk), *filters)):
+                found[row.id] = row
+
+        attempts = 0
+        while len(found) < count and attempts < OVERSAMPLE:
+            attempts += 1
+            pivot = random.choice(ids)
+            rows = db.execute(
+                select(*CARD_FIELDS)
+                .where(Card.id >= pivot, *filters)
+                .order_by(Card.id)
+                .limit(count - len(found))
+            ).all()
+            if not rows:
+                # Nothing matches past this pivot; wrap around to the start of the key range.
+                rows = db.execute(
+                    select(*CARD_FIELDS).where(*filters).order_by(Card.id).limit(count - len(found))
+                ).all()
+            for row in rows:
+                found[row.id] = row
+
+        rows = list(found.values())
+        random.shuffle(rows)
+        return rows[:count]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _reservoir(self, db: Session) -> List[str]:
+        if self._ids and time.monotonic() - self._loaded_at < self.ttl:
+            return self._ids
+        # Only one request pays for a refresh; the rest keep using the old reservoir.
+        if not self._lock.acquire(blocking=not self._ids):
+            return self._ids
+        try:
+            if not self._ids or time.monotonic() - self._loaded_at >= self.ttl:
+                self._ids = self._probe(db, self.size)
+                self._loaded_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self._ids
+
+    def _probe(self, db: Session, k: int) -> List[str]:
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            rowid = literal_column("rowid")
+            max_rowid = db.execute(select(func.max(rowid)).select_from(Card)).scalar()
+            if not max_rowid:
+                return []
+            picks = list({random.randint(1, max_rowid) for _ in range(k)})
+            ids = []
+            for i in range(0, len(picks), LOOKUP_CHUNK):
+                ids.extend(db.execute(
+                    select(Card.id).where(rowid.in_(picks[i:i + LOOKUP_CHUNK]))
+                ).scalars())
+            return ids
+        if dialect == "postgresql":
+            estimate = db.execute(
+                text("SELECT reltuples FROM pg_class WHERE oid = 'cards'::regclass")
+            ).scalar() or 0
+            if estimate > k * 10:
+                percent = min(100.0, 100.0 * k * 2 / estimate)
+                return list(db.execute(
+                    text(f"SELECT id FROM cards TABLESAMPLE SYSTEM ({percent:.6f}) LIMIT :k"), {"k": k}
+                ).scalars())
+        return list(db.execute(select(Card.id).order_by(func.random()).limit(k)).scalars())
+
+
+card_sampler = CardSampler()
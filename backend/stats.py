@@ -0,0 +1,133 @@
+import os
+import random
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import case, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from database import tag, without_statement_timeout
+from models import Customer, Card, Trip, Case, TapHistory, StatsCounter
+from tap_archive import archived_row_count
+
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "300"))
+# Every counter (and every table version in etags.py) is spread over this
+# many rows. A committing transaction updates one shard picked at random
+# and readers sum the shards, so concurrent writers rarely queue on the
+# same row lock.
+COUNTER_SHARDS = max(1, int(os.getenv("COUNTER_SHARDS", "8")))
+
+COUNTERS = (
+    "total_cards",
+    "total_customers",
+    "total_trips",
+    "total_balance",
+    "total_cases",
+    "total_tap_entries",
+)
+
+_PENDING_KEY = "pending_stats"
+
+
+def bump(db: Session, **deltas) -> None:
+    """Record counter changes for the session's current transaction.
+
+    Deltas are summed in memory and written with one UPDATE to a random
+    shard just before the transaction commits, so a rolled-back write never
+    moves a counter and a request that touches several counters still costs
+    a single statement.
+    """
+    pending = db.info.setdefault(_PENDING_KEY, {})
+    for name, delta in deltas.items():
+        if delta:
+            pending[name] = pending.get(name, 0) + delta
+
+
+def compute_exact(db: Session) -> Dict[str, float]:
+    return {
+        "total_cards": db.query(func.count(Card.id)).scalar(),
+        "total_customers": db.query(func.count(Customer.id)).scalar(),
+        "total_trips": db.query(func.count(Trip.id)).scalar(),
+        "total_balance": db.query(func.sum(Card.balance)).scalar() or 0.0,
+        "total_cases": db.query(func.count(Case.id)).scalar(),
+        # Archived taps still count; the archive keeps their row counts.
+        "total_tap_entries": db.query(func.count(TapHistory.id)).scalar() + archived_row_count(db),
+    }
+
+
+def read_counters(db: Session) -> Dict[str, float]:
+    """O(1) read of the maintained counters, summed over their shards; missing counters are left out."""
+    return dict(db.execute(
+        select(StatsCounter.name, func.sum(StatsCounter.value)).group_by(StatsCounter.name)
+    ).all())
+
+
+def reconcile(db: Session, read_db: Optional[Session] = None) -> Dict[str, float]:
+    """Overwrite the counters with exact values to correct any drift.
+
+    The full-table counts run on `read_db` when given, so the writer (on
+    SQLite, the single write connection) is only held for the UPDATEs.
+    """
+    read_db = read_db or db
+    without_statement_timeout(read_db.connection())
+    exact = compute_exact(read_db)
+    if read_db is not db:
+        read_db.rollback()
+    db.info.pop(_PENDING_KEY, None)
+    existing = set(db.execute(select(StatsCounter.name, StatsCounter.shard)).all())
+    for name in COUNTERS:
+        missing = [shard for shard in range(COUNTER_SHARDS) if (name, shard) not in existing]
+        if missing:
+            db.execute(insert(StatsCounter), [{"name": name, "shard": shard, "value": 0.0} for shard in missing])
+        # Shard 0 takes the exact value and the rest restart from zero.
+        # Update in place rather than delete and re-insert, so a concurrent
+        # increment waits on its row instead of missing it.
+        db.execute(
+            update(StatsCounter).where(StatsCounter.name == name)
+            .values(value=case((StatsCounter.shard == 0, exact[name]), else_=0.0))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return exact
+
+
+def start_reconciler(read_session_factory, write_session_factory,
+                     interval: float = STATS_RECONCILE_INTERVAL) -> threading.Event:
+    """Reconcile once now and then every `interval` seconds on a daemon thread.
+
+    Counts on a read session and writes the results on a write session.
+    Returns an Event that stops the thread when set.
+    """
+    stop = threading.Event()
+
+    def run():
+        while True:
+            try:
+                with read_session_factory(info=tag("stats")) as read_db, \
+                        write_session_factory(info=tag("stats")) as db:
+                    reconcile(db, read_db)
+            except Exception as e:
+                print(f"Stats reconciliation failed: {e}")
+            if stop.wait(interval):
+                return
+
+    threading.Thread(target=run, name="stats-reconciler", daemon=True).start()
+    return stop
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_counters(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    session.execute(
+        update(StatsCounter)
+        .where(StatsCounter.name.in_(list(pending)), StatsCounter.shard == random.randrange(COUNTER_SHARDS))
+        .values(value=StatsCounter.value + case(pending, value=StatsCounter.name, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_counters(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,295 @@
+import operator
+import os
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache, reduce
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, WriteSessionLocal, tag, without_statement_timeout, write_engine
+from models import TapArchive, TapHistory
+from partitions import TABLE, add_months, drop_month, month_start, months
+
+# Months that fall out of the retention window move from tap_history into
+# zstd-compressed Parquet files, one per month (and per run, should late
+# taps for an archived month turn up). tap_archives lists every file with
+# the time span it covers. The tap history routes read the database first
+# and open archive files only when a request reaches past what it holds.
+#   TAP_RETENTION_MONTHS  months kept in the database, the current one included
+#   TAP_ARCHIVE_DIR       where the Parquet files are written
+TAP_RETENTION_MONTHS = int(os.getenv("TAP_RETENTION_MONTHS", "12"))
+TAP_ARCHIVE_DIR = os.getenv("TAP_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+TAP_ARCHIVE_BATCH = 50000
+
+COLUMNS = [column.name for column in TapHistory.__table__.columns]
+_NEWEST_FIRST = [("tap_time", "descending"), ("id", "descending")]
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Tap archives need the pyarrow package (pip install pyarrow)")
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([(name, pa.timestamp("us") if name == "tap_time" else pa.string()) for name in COLUMNS])
+
+
+@lru_cache(maxsize=None)
+def _row_type(columns: Tuple[str, ...]):
+    return namedtuple("ArchivedTap", columns)
+
+
+def _path(entry: TapArchive) -> str:
+    return os.path.join(TAP_ARCHIVE_DIR, entry.file)
+
+
+def id_key(tap_id: str) -> Tuple[int, str]:
+    """Sort key for tap IDs: numeric order once the zero-padded number outgrows its width"""
+    return len(tap_id), tap_id
+
+
+def _write(path: str, partitions) -> dict:
+    """Write row batches to a Parquet file, a row group each; returns the row count, time span and ID range"""
+    pa = _arrow()
+    schema = _schema(pa)
+    count, first, last, first_id, last_id = 0, None, None, None, None
+    writer = None
+    try:
+        for rows in partitions:
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(path, schema, compression="zstd")
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)],
+                schema=schema,
+            ))
+            count += len(rows)
+            times = [row.tap_time for row in rows]
+            first = min(times) if first is None else min(first, *times)
+            last = max(times) if last is None else max(last, *times)
+            ids = [row.id for row in rows] + [i for i in (first_id, last_id) if i is not None]
+            first_id, last_id = min(ids, key=id_key), max(ids, key=id_key)
+    finally:
+        if writer is not None:
+            writer.close()
+    return {"row_count": count, "first_tap": first, "last_tap": last, "first_id": first_id, "last_id": last_id}
+
+
+def archive_month(month: datetime) -> Optional[dict]:
+    """Move one month of taps from the database into a new archive file.
+
+    Returns the new tap_archives entry, or None when the database has no
+    taps left for that month.
+    """
+    conditions = [TapHistory.tap_time >= month, TapHistory.tap_time < add_months(month, 1)]
+    writer = WriteSessionLocal(info=tag("archive"))
+    reader = writer
+    file = f"{TABLE}_{month:%Y_%m}_{datetime.now():%Y%m%d%H%M%S}.parquet"
+    path = os.path.join(TAP_ARCHIVE_DIR, file)
+    try:
+        if write_engine.dialect.name == "sqlite":
+            # Read on the main pool rather than SQLite's single writer
+            # connection, so writes carry on while the file is written.
+            # Taps inserted meanwhile get higher rowids and wait for the
+            # next run.
+            reader = SessionLocal(info=tag("archive"))
+            rowid = literal_column("rowid")
+            cap = reader.execute(select(func.max(rowid)).select_from(TapHistory)).scalar()
+            if cap is None:
+                return None
+            conditions.append(rowid <= cap)
+        else:
+            # Copy and delete from one snapshot: a tap committed meanwhile
+            # is neither archived nor deleted.
+            writer.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        without_statement_timeout(reader.connection())
+
+        os.makedirs(TAP_ARCHIVE_DIR, exist_ok=True)
+        # Sorted by customer, so each row group's customer_id statistics
+        # let a per-customer read skip nearly every row group in the file.
+        result = reader.execute(
+            select(*TapHistory.__table__.columns)
+            .where(*conditions)
+            .order_by(TapHistory.customer_id, TapHistory.tap_time, TapHistory.id)
+            .execution_options(yield_per=TAP_ARCHIVE_BATCH)
+        )
+        written = _write(path + ".tmp", result.partitions())
+        if not written["row_count"]:
+            return None
+        os.replace(path + ".tmp", path)
+
+        # A crash from here on leaves an unlisted file behind, never a
+        # listed file whose taps are also still in the database.
+        without_statement_timeout(writer.connection())
+        writer.execute(delete(TapHistory).where(*conditions).execution_options(synchronize_session=False))
+        entry = {"file": file, "month": f"{month:%Y-%m}", **written, "archived_at": datetime.now()}
+        writer.execute(insert(TapArchive).values(**entry))
+        writer.commit()
+        return entry
+    finally:
+        if os.path.exists(path + ".tmp"):
+            os.remove(path + ".tmp")
+        if reader is not writer:
+            reader.close()
+        writer.close()
+
+
+def archive_expired(retention_months: int = TAP_RETENTION_MONTHS, now: Optional[datetime] = None,
+                    progress=None) -> List[dict]:
+    """Archive every month older than the retention window, oldest first"""
+    cutoff = add_months(month_start(now or datetime.now()), 1 - max(1, retention_months))
+    with SessionLocal(info=tag("archive")) as db:
+        oldest = db.execute(select(func.min(TapHistory.tap_time)).where(TapHistory.tap_time < cutoff)).scalar()
+    archived = []
+    if oldest is None:
+        return archived
+    for month in months(oldest, add_months(cutoff, -1)):
+        entry = archive_month(month)
+        if entry is not None:
+            archived.append(entry)
+            if progress is not None:
+                progress(entry)
+        with write_engine.begin() as conn:
+            drop_month(conn, month)
+    return archived
+
+
+def catalog(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[TapArchive]:
+    """Archive files overlapping [start, end), newest first"""
+    query = select(TapArchive).order_by(TapArchive.last_tap.desc())
+    if start is not None:
+        query = query.where(TapArchive.last_tap >= start)
+    if end is not None:
+        query = query.where(TapArchive.first_tap < end)
+    return db.execute(query).scalars().all()
+
+
+def reaches_archive(db: Session, since: Optional[datetime]) -> bool:
+    """Whether a newest-first read going back to `since` reaches archived taps.
+
+    Reads without a lower bound stay on the database, so routes only open
+    archive files when the caller explicitly asks for older taps.
+    """
+    if since is None:
+        return False
+    newest = db.execute(select(func.max(TapArchive.last_tap))).scalar()
+    return newest is not None and since <= newest
+
+
+def archived_row_count(db: Session) -> int:
+    return db.execute(select(func.coalesce(func.sum(TapArchive.row_count), 0))).scalar()
+
+
+def _filter(pa, customer_id=None, start=None, end=None, before=None):
+    field = pa.dataset.field
+    conditions = []
+    if customer_id is not None:
+        conditions.append(field("customer_id") == customer_id)
+    if start is not None:
+        conditions.append(field("tap_time") >= pa.scalar(start, type=pa.timestamp("us")))
+    if end is not None:
+        conditions.append(field("tap_time") < pa.scalar(end, type=pa.timestamp("us")))
+    if before is not None:
+        at = pa.scalar(before[0], type=pa.timestamp("us"))
+        conditions.append((field("tap_time") < at) | ((field("tap_time") == at) & (field("id") < before[1])))
+    return reduce(operator.and_, conditions) if conditions else None
+
+
+def archived_batches(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     batch_size: int = TAP_ARCHIVE_BATCH) -> Iterator[list]:
+    """Every archived tap in [start, end) as lists of value tuples in COLUMNS order.
+
+    Streams a file batch at a time, oldest file first and in no particular
+    order within a file, for exports.
+    """
+    entries = catalog(db, start, end)
+    if not entries:
+        return
+    pa = _arrow()
+    expression = _filter(pa, start=start, end=end)
+    for entry in reversed(entries):
+        dataset = pa.dataset.dataset(_path(entry), format="parquet")
+        for batch in dataset.to_batches(columns=COLUMNS, filter=expression, batch_size=batch_size):
+            if batch.num_rows:
+                yield list(zip(*(batch.column(i).to_pylist() for i in range(len(COLUMNS)))))
+
+
+def archived_taps(
+    db: Session,
+    columns: Sequence[str] = COLUMNS,
+    customer_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    before: Optional[Tuple[datetime, str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> list:
+    """Archived taps matching the filters, newest first, as named tuples of `columns`.
+
+    `before` is a (tap_time, id) keyset position; only taps that sort after
+    it are returned. Files are read newest first, and reading stops as soon
+    as the page is full and every remaining file is older than its last row.
+    """
+    entries = [entry for entry in catalog(db, start, end) if before is None or entry.first_tap <= before[0]]
+    if not entries:
+        return []
+    pa = _arrow()
+    expression = _filter(pa, customer_id, start, end, before)
+
+    need = None if limit is None else offset + limit
+    read = list(dict.fromkeys(["tap_time", "id", *columns]))
+    found = None
+    for entry in entries:
+        if need is not None and found is not None and found.num_rows >= need \
+                and entry.last_tap < found["tap_time"][need - 1].as_py():
+            break
+        parts = [] if found is None else [found]
+        for batch in pa.dataset.dataset(_path(entry), format="parquet").to_batches(columns=read, filter=expression):
+            if batch.num_rows:
+                table = pa.Table.from_batches([batch])
+                # Keep at most a page per batch, so memory follows the page size.
+                parts.append(table if need is None else table.sort_by(_NEWEST_FIRST).slice(0, need))
+        if parts:
+            found = pa.concat_tables(parts).sort_by(_NEWEST_FIRST)
+            if need is not None:
+                found = found.slice(0, need)
+    if found is None:
+        return []
+    found = found.slice(offset, limit)
+    row = _row_type(tuple(columns))
+    return [row(*values) for values in zip(*(found.column(name).to_pylist() for name in columns))]
+
+
+def archived_tap(db: Session, tap_id: str, columns: Sequence[str] = COLUMNS):
+    """One archived tap by ID, or None.
+
+    Only files whose recorded ID range covers `tap_id` are opened, so an
+    unknown ID usually costs just the catalog read.
+    """
+    key = id_key(tap_id)
+    entries = [
+        entry for entry in catalog(db)
+        if entry.first_id is None or id_key(entry.first_id) <= key <= id_key(entry.last_id)
+    ]
+    if not entries:
+        return None
+    pa = _arrow()
+    for entry in entries:
+        table = pa.dataset.dataset(_path(entry), format="parquet").to_table(
+            columns=list(columns), filter=pa.dataset.field("id") == tap_id
+        )
+        if table.num_rows:
+            return _row_type(tuple(columns))(*(table.column(name)[0].as_py() for name in columns))
+    return None
+
+
+def newest_first(*sources, limit: Optional[int] = None) -> list:
+    """Merge tap rows from the database and the archive by (tap_time, id), newest first"""
+    rows = sorted((row for source in sources for row in source), key=lambda row: (row.tap_time, row.id), reverse=True)
+    return rows if limit is None else rows[:limit]
@@ -22,7 +22,8 @@ import {
 } from '@chakra-ui/react'
 import { useState } from 'react'
 import { FaUser, FaExclamationCircle, FaSearch } from 'react-icons/fa'
-import { getCards, getCustomers, getTrips, getCases, getTapHistoryByCustomer } from '../services/api'
+import axios from 'axios'
+import { getCardOverview, CardOverview } from '../services/api'
 
 interface Trip {
   id: string;
@@ -99,17 +100,19 @@ const ProductSearch = () => {
     setTapHistory([])
 
     try {
-      const cards = await getCards()
-      const card = cards.find((c: any) => c.id === searchQuery)
-      
-      if (!card) {
-        setError('Product not found')
-        setIsLoading(false)
-        return
+      let overview: CardOverview
+      try {
+        overview = await getCardOverview(searchQuery.trim(), 5)
+      } catch (err) {
+        if (axios.isAxiosError(err) && err.response?.status === 404) {
+          setError('Product not found')
+          setIsLoading(false)
+          return
+        }
+        throw err
       }
 
-      const customers = await getCustomers()
-      const customer = customers.find((c: any) => c.id === card.customer_id)
+      const { card, customer } = overview
 
       if (!customer) {
         setError('Customer information not found')
@@ -117,50 +120,29 @@ const ProductSearch = () => {
         return
       }
 
-      const allTrips = await getTrips()
-      console.log('All trips:', allTrips)
-      
-      const cardTrips = allTrips
-        .filter((t: any) => {
-          console.log('Checking trip:', t)
-          console.log('Card ID match?', t.card_id === card.id)
-          return t.card_id === card.id
-        })
-        .map((trip: any) => {
-          console.log('Processing trip:', trip)
-          const processed = {
-            id: trip.id || '',
-            card_id: trip.card_id || '',
-            entry_location: trip.entry_location || '',
-            exit_location: trip.exit_location || '',
-            fare: typeof trip.fare === 'number' ? trip.fare : parseFloat(trip.fare) || 0,
-            route: trip.route || '',
-            operator: trip.operator || '',
-            transit_mode: trip.transit_mode || '',
-            start_time: trip.start_time || new Date().toISOString(),
-            end_time: trip.end_time || new Date().toISOString()
-          }
-          console.log('Processed trip:', processed)
-          return processed
-        })
-        .sort((a: Trip, b: Trip) => new Date(b.start_time).getTime() - new Date(a.start_time).getTime())
-        .slice(0, 5)
-
-      console.log('Final cardTrips:', cardTrips)
+      const cardTrips = overview.recent_trips.map((trip: any) => ({
+        id: trip.id || '',
+        card_id: trip.card_id || '',
+        entry_location: trip.entry_location || '',
+        exit_location: trip.exit_location || '',
+        fare: typeof trip.fare === 'number' ? trip.fare : parseFloat(trip.fare) || 0,
+        route: trip.route || '',
+        operator: trip.operator || '',
+        transit_mode: trip.transit_mode || '',
+        start_time: trip.start_time || new Date().toISOString(),
+        end_time: trip.end_time || new Date().toISOString()
+      }))
 
-      const allCases = await getCases()
-      const customerCases = allCases
-        .filter((c: any) => c.customer_id === card.customer_id)
+      const customerCases = overview.recent_cases
+        .slice(0, 3)
         .map((case_: any) => ({
           id: case_.id || '',
-          type: case_.type || '',
-          status: case_.status || 'Unknown',
+          type: case_.category || '',
+          status: case_.case_status || 'Unknown',
           priority: case_.priority || 'Normal',
-          created_at: case_.created_at || new Date().toISOString(),
+          created_at: case_.created_date || new Date().toISOString(),
           notes: case_.notes || ''
         }))
-        .sort((a: Case, b: Case) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
-        .slice(0, 3)
 
       setCardDetails({
         card: {
@@ -181,12 +163,7 @@ const ProductSearch = () => {
         cases: customerCases
       })
 
-      const tapHistoryData = await getTapHistoryByCustomer(card.customer_id)
-      setTapHistory(
-        tapHistoryData
-          .sort((a: TapHistoryEntry, b: TapHistoryEntry) => new Date(b.tap_time).getTime() - new Date(a.tap_time).getTime())
-          .slice(0, 5)
-      )
+      setTapHistory(overview.recent_taps)
     } catch (error) {
       console.error('Error:', error)
       toast({
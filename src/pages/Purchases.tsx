@@ -26,7 +26,8 @@ import {
 import { FiEdit2, FiTrash2, FiPlus } from 'react-icons/fi';
 import EditModal from '../components/EditModal';
 import {
-  getTrips,
+  searchTrips,
+  TripSearchParams,
   createTrip,
   updateTrip,
   deleteTrip,
@@ -90,6 +91,7 @@ const locations = [
 const transitModes = ['SubWay', 'Bus', 'Rail'];
 const operators = ['Metro Transit', 'City Bus', 'Regional Rail'];
 const adjustableOptions = ['Yes', 'No'];
+const PAGE_SIZE = 100;
 
 const tripFields = [
   {
@@ -169,7 +171,7 @@ function Purchases() {
   const [searchQuery, setSearchQuery] = useState('');
   const [selectedFilter, setSelectedFilter] = useState('none');
   const [trips, setTrips] = useState<Trip[]>([]);
-  const [filteredTrips, setFilteredTrips] = useState<Trip[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [selectedTrip, setSelectedTrip] = useState<Trip | null>(null);
   const [cards, setCards] = useState<Card[]>([]);
   const [loading, setLoading] = useState(true);
@@ -194,13 +196,30 @@ function Purchases() {
   const [disputeDate, setDisputeDate] = useState('');
   const [disputeType, setDisputeType] = useState('');
 
-  const fetchTrips = async () => {
+  const buildSearchParams = (cursor?: string): TripSearchParams => {
+    const params: TripSearchParams = { limit: PAGE_SIZE };
+    const minFare = parseFloat(filters.min_fare);
+    const maxFare = parseFloat(filters.max_fare);
+    if (filters.start_date) params.start_date = filters.start_date;
+    if (filters.end_date) params.end_date = filters.end_date;
+    if (!isNaN(minFare)) params.min_fare = minFare;
+    if (!isNaN(maxFare)) params.max_fare = maxFare;
+    if (filters.route) params.route = filters.route;
+    if (filters.exit_location) params.exit_location = filters.exit_location;
+    if (filters.transit_mode) params.transit_mode = filters.transit_mode;
+    if (filters.adjustable) params.adjustable = filters.adjustable;
+    if (filters.operator) params.operator = filters.operator;
+    if (filters.entry_location) params.entry_location = filters.entry_location;
+    if (cursor) params.cursor = cursor;
+    return params;
+  };
+
+  const fetchTrips = async (cursor?: string) => {
     try {
-      setLoading(true);
-      const data = await getTrips();
-      const sortedData = data.slice().sort((a: Trip, b: Trip) => new Date(b.start_time).getTime() - new Date(a.start_time).getTime());
-      setTrips(sortedData);
-      setFilteredTrips(sortedData);
+      if (!cursor) setLoading(true);
+      const page = await searchTrips(buildSearchParams(cursor));
+      setTrips(prev => (cursor ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.next_cursor);
     } catch (error) {
       toast({
         title: 'Error fetching trips',
@@ -229,54 +248,12 @@ function Purchases() {
   };
 
   useEffect(() => {
-    fetchTrips();
     fetchCards();
   }, []);
 
   useEffect(() => {
-    const applyFilters = () => {
-      let result = [...trips];
-
-      if (filters.start_date) {
-        result = result.filter(trip => new Date(trip.start_time) >= new Date(filters.start_date));
-      }
-      if (filters.end_date) {
-        result = result.filter(trip => new Date(trip.end_time) <= new Date(filters.end_date));
-      }
-      if (filters.route) {
-        result = result.filter(trip => 
-          trip.route.toLowerCase().includes(filters.route.toLowerCase())
-        );
-      }
-      if (filters.min_fare) {
-        result = result.filter(trip => trip.fare >= parseFloat(filters.min_fare));
-      }
-      if (filters.max_fare) {
-        result = result.filter(trip => trip.fare <= parseFloat(filters.max_fare));
-      }
-      if (filters.exit_location) {
-        result = result.filter(trip => 
-          trip.exit_location.toLowerCase().includes(filters.exit_location.toLowerCase())
-        );
-      }
-      if (filters.transit_mode) {
-        result = result.filter(trip => trip.transit_mode === filters.transit_mode);
-      }
-      if (filters.adjustable) {
-        result = result.filter(trip => trip.adjustable === filters.adjustable);
-      }
-      if (filters.operator) {
-        result = result.filter(trip => trip.operator === filters.operator);
-      }
-      if (filters.entry_location) {
-        result = result.filter(trip => trip.entry_location === filters.entry_location);
-      }
-
-      setFilteredTrips(result);
-    };
-
-    applyFilters();
-  }, [filters, trips]);
+    fetchTrips();
+  }, [filters]);
 
   const handleFilterChange = (field: keyof Filters, value: string) => {
     setFilters(prev => ({
@@ -549,7 +526,7 @@ function Purchases() {
                     </Tr>
                   </Thead>
                   <Tbody>
-                    {filteredTrips.map((trip) => (
+                    {trips.map((trip) => (
                       <Tr key={trip.id}>
                         <Td>{trip.id}</Td>
                         <Td>{trip.card_id}</Td>
@@ -599,6 +576,11 @@ function Purchases() {
                     ))}
                   </Tbody>
                 </Table>
+                {nextCursor && (
+                  <Center p={4}>
+                    <Button onClick={() => fetchTrips(nextCursor)}>Load more</Button>
+                  </Center>
+                )}
               </Box>
             )}
           </VStack>
@@ -144,6 +144,26 @@ export const getCard = async (id: string) => {
   return response.data;
 };
 
+export interface CardOverview {
+  card: Card;
+  customer: Customer | null;
+  totals: {
+    trip_count: number;
+    trip_fare_total: number;
+    case_count: number;
+    open_case_count: number;
+    tap_count: number;
+  };
+  recent_trips: Trip[];
+  recent_cases: Case[];
+  recent_taps: TapHistoryEntry[];
+}
+
+export const getCardOverview = async (id: string, recent = 5): Promise<CardOverview> => {
+  const response = await axios.get(`/cards/${encodeURIComponent(id)}/overview`, { params: { recent } });
+  return response.data;
+};
+
 export const createCard = async (data: Partial<Card>) => {
   const response = await axios.post('/cards/', data);
   return response.data;
@@ -164,6 +184,32 @@ export const getTrips = async () => {
   return response.data;
 };
 
+export interface TripSearchParams {
+  start_date?: string;
+  end_date?: string;
+  min_fare?: number;
+  max_fare?: number;
+  transit_mode?: string;
+  adjustable?: string;
+  operator?: string;
+  entry_location?: string;
+  exit_location?: string;
+  route?: string;
+  card_id?: string;
+  limit?: number;
+  cursor?: string;
+}
+
+export interface TripPage {
+  items: Trip[];
+  next_cursor: string | null;
+}
+
+export const searchTrips = async (params: TripSearchParams): Promise<TripPage> => {
+  const response = await axios.get('/trips/search', { params });
+  return response.data;
+};
+
 export const getTrip = async (id: string) => {
   const response = await axios.get(`/trips/${id}`);
   return response.data;